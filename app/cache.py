@@ -0,0 +1,259 @@
+"""Response cache for public read endpoints.
+
+Entries are keyed by endpoint and normalized query parameters and tagged
+with dependency keys such as "post:1", "user:2" or "posts". Write
+endpoints invalidate the dependency keys they touch, which drops every
+entry built from that data.
+
+Dependency keys in use:
+    posts             - membership of post listings (create, delete, publish)
+    post:{id}         - a post's own fields and counters
+    post-views:{id}   - a post's view counter, on the single-post entry only
+    user:{id}         - a user's profile fields, embedded in posts and comments
+    user-stats:{id}   - a user's post and follower counts
+    user-posts:{id}   - membership of a user's post listing
+    comments:{id}     - comments of a post
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Optional, Set
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+
+from app.config import settings
+from app.http_cache import set_validators
+
+# Response headers that are part of a cached entry
+CACHED_HEADERS = ("X-Next-Cursor", "ETag", "Last-Modified")
+
+
+class LRUCache:
+    """Bounded, thread-safe LRU mapping whose entries expire after ttl seconds"""
+
+    def __init__(self, maxsize: int, ttl: float, on_evict: Optional[Callable[[str, Any], None]] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._on_evict = on_evict
+        self._data: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + (ttl or self.ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._remove(next(iter(self._data)))
+
+    def delete(self, key) -> None:
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _remove(self, key) -> None:
+        _, value = self._data.pop(key)
+        if self._on_evict:
+            self._on_evict(key, value)
+
+
+class MemoryCacheBackend:
+    """In-process LRU backend for tests and single-worker deployments"""
+
+    name = "memory"
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._entries = LRUCache(maxsize, ttl, on_evict=self._forget)
+        self._deps: Dict[str, Set[str]] = {}
+        self._lock = threading.RLock()
+
+    def get(self, key: str) -> Optional[Any]:
+        # Expiry inside get() calls back into _forget, so take the locks in the same order as set()
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry[1] if entry else None
+
+    def set(self, key: str, value: Any, deps: Iterable[str]) -> None:
+        deps = tuple(deps)
+        with self._lock:
+            self._entries.set(key, (deps, value))
+            for dep in deps:
+                self._deps.setdefault(dep, set()).add(key)
+
+    def invalidate(self, deps: Iterable[str]) -> None:
+        with self._lock:
+            for dep in deps:
+                for key in self._deps.pop(dep, ()):
+                    self._entries.delete(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._deps.clear()
+
+    def size(self) -> int:
+        return len(self._entries)
+
+    def _forget(self, key: str, entry: tuple) -> None:
+        with self._lock:
+            for dep in entry[0]:
+                keys = self._deps.get(dep)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._deps[dep]
+
+
+class RedisCacheBackend:
+    """Redis backend shared by all workers; dependency keys are Redis sets of entry keys"""
+
+    name = "redis"
+    prefix = "blog:cache:"
+
+    def __init__(self, url: str, ttl: int):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self._redis.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any, deps: Iterable[str]) -> None:
+        pipe = self._redis.pipeline()
+        pipe.set(self.prefix + key, json.dumps(value), ex=self.ttl)
+        for dep in deps:
+            dep_key = f"{self.prefix}dep:{dep}"
+            pipe.sadd(dep_key, key)
+            pipe.expire(dep_key, self.ttl)
+        pipe.execute()
+
+    def invalidate(self, deps: Iterable[str]) -> None:
+        dep_keys = [f"{self.prefix}dep:{dep}" for dep in deps]
+        pipe = self._redis.pipeline()
+        for dep_key in dep_keys:
+            pipe.smembers(dep_key)
+        members = pipe.execute()
+        keys = {self.prefix + key.decode("utf-8") for group in members for key in group}
+        self._redis.delete(*keys, *dep_keys)
+
+    def clear(self) -> None:
+        keys = list(self._redis.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self._redis.delete(*keys)
+
+    def size(self) -> int:
+        return sum(1 for key in self._redis.scan_iter(match=self.prefix + "*") if b":dep:" not in key)
+
+
+class ResponseCache:
+    """Cache facade used by the routers, counts hits and misses"""
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    @staticmethod
+    def make_key(namespace: str, **params) -> str:
+        """Build a key from sorted query parameters, ignoring unset ones"""
+        parts = [f"{name}={value}" for name, value in sorted(params.items()) if value is not None]
+        return f"{namespace}?{'&'.join(parts)}"
+
+    def load(self, key: str, response: Optional[Response] = None) -> Optional[Any]:
+        """Return a cached body (restoring its headers) or None on a miss"""
+        if not self.enabled:
+            return None
+        entry = self.backend.get(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        if response is not None:
+            response.headers.update(entry["headers"])
+        return entry["body"]
+
+    def store(self, key: str, body: Any, deps: Iterable[str], response: Optional[Response] = None) -> Any:
+        """Cache a body with its dependency keys and return it unchanged.
+
+        With a response, the body's ETag and Last-Modified are set on it
+        and kept with the entry.
+        """
+        encoded = jsonable_encoder(body)
+        headers = {}
+        if response is not None:
+            set_validators(response, encoded, datetime.now(timezone.utc))
+            headers = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+        if self.enabled:
+            self.backend.set(key, {"body": encoded, "headers": headers}, deps)
+        return body
+
+    def invalidate(self, *deps: str) -> None:
+        if self.enabled and deps:
+            self.backend.invalidate(deps)
+
+    def clear(self) -> None:
+        if self.enabled:
+            self.backend.clear()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": self.backend.name if self.enabled else "none",
+            "entries": self.backend.size() if self.enabled else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def post_list_deps(posts, *deps: str) -> list:
+    """Dependency keys of a cached post listing: the listing itself plus every post and author on it"""
+    keys = list(deps)
+    for post in posts:
+        keys.append(f"post:{post.id}")
+        keys.append(f"user:{post.user_id}")
+    return keys
+
+
+def create_cache_backend():
+    if settings.CACHE_BACKEND == "redis":
+        return RedisCacheBackend(settings.REDIS_URL, settings.CACHE_TTL)
+    if settings.CACHE_BACKEND == "memory":
+        return MemoryCacheBackend(settings.CACHE_MAX_ENTRIES, settings.CACHE_TTL)
+    return None
+
+
+response_cache = ResponseCache(create_cache_backend())
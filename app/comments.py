@@ -0,0 +1,146 @@
+"""Comment threads and streams.
+
+Threaded trees are built from one recursive query; full comment lists
+are streamed as NDJSON in fixed-size batches so memory stays flat
+however long the thread is.
+"""
+
+from typing import Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import func, literal, select
+from sqlalchemy.orm import Session, aliased, joinedload
+
+from app.database import Comment
+from app.db_utils import async_engine, engine
+from app.schemas import CommentResponse, CommentTreeResponse
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Rows fetched from the cursor per round trip while streaming
+COMMENT_STREAM_BATCH = 500
+
+
+def comment_tree(
+    db: Session,
+    post_id: int,
+    max_depth: int,
+    offset: int,
+    limit: int,
+    replies_limit: int,
+    parent_id: Optional[int] = None
+) -> Tuple[List[CommentTreeResponse], Set[int]]:
+    """Nested threads of a post's comments and the ids of their authors.
+
+    A page of top-level comments (newest first) is the anchor of a
+    recursive CTE that walks down to max_depth levels, keeping the first
+    replies_limit replies (oldest first) under every comment. Replies are
+    ranked only under comments of the page's threads, so the cost follows
+    the page rather than the whole post. Comments and their authors come
+    back in a single statement.
+
+    With parent_id the anchor is a page of that comment's replies instead
+    (oldest first, like replies everywhere), which is how replies beyond
+    replies_limit are fetched.
+    """
+    if parent_id is None:
+        roots = select(Comment.id).where(
+            Comment.post_id == post_id,
+            Comment.parent_comment_id.is_(None)
+        ).order_by(Comment.created_at.desc(), Comment.id.desc())
+    else:
+        roots = select(Comment.id).where(
+            Comment.post_id == post_id,
+            Comment.parent_comment_id == parent_id
+        ).order_by(Comment.created_at, Comment.id)
+    roots = roots.offset(offset).limit(limit)
+
+    # Comments of the page's threads that can have replies shown, i.e. above max_depth
+    parents = select(Comment.id, literal(1).label("depth")).where(
+        Comment.id.in_(roots)
+    ).cte("thread_parents", recursive=True)
+    parents = parents.union_all(
+        select(Comment.id, parents.c.depth + 1).join(
+            parents, Comment.parent_comment_id == parents.c.id
+        ).where(parents.c.depth < max_depth - 1)
+    )
+
+    # Position of every reply among its siblings, for those parents only
+    ranked = select(
+        Comment.id,
+        Comment.parent_comment_id,
+        func.row_number().over(
+            partition_by=Comment.parent_comment_id,
+            order_by=(Comment.created_at, Comment.id)
+        ).label("position")
+    ).where(
+        Comment.parent_comment_id.in_(select(parents.c.id))
+    ).subquery()
+
+    tree = select(Comment.id, literal(1).label("depth")).where(
+        Comment.id.in_(roots)
+    ).cte("comment_tree", recursive=True)
+    tree = tree.union_all(
+        select(ranked.c.id, tree.c.depth + 1).join(
+            tree, ranked.c.parent_comment_id == tree.c.id
+        ).where(
+            tree.c.depth < max_depth,
+            ranked.c.position <= replies_limit
+        )
+    )
+
+    children = aliased(Comment)
+    replies_count = select(func.count(children.id)).where(
+        children.parent_comment_id == Comment.id
+    ).scalar_subquery()
+
+    rows = db.query(Comment, replies_count).join(
+        tree, tree.c.id == Comment.id
+    ).options(
+        joinedload(Comment.user)
+    ).order_by(Comment.created_at, Comment.id).all()
+
+    nodes = {}
+    for comment, count in rows:
+        # The ORM `replies` relationship is not the loaded subtree, so it is left out
+        nodes[comment.id] = CommentTreeResponse(
+            **CommentResponse.from_orm(comment).dict(),
+            replies_count=count
+        )
+
+    top_level = []
+    for comment, _ in rows:
+        parent = nodes.get(comment.parent_comment_id)
+        if parent is not None:
+            parent.replies.append(nodes[comment.id])
+        elif comment.parent_comment_id == parent_id:
+            top_level.append(nodes[comment.id])
+
+    if parent_id is None:
+        top_level.reverse()
+    return top_level, {comment.user_id for comment, _ in rows}
+
+
+def stream_bind(db: Session):
+    """Engine a stream can open its own connection on once the request session is closed"""
+    bind = db.get_bind()
+    # Async sessions hand out their engine's sync facade, usable only inside run_sync
+    if async_engine is not None and bind is async_engine.sync_engine:
+        return engine
+    return bind
+
+
+def stream_comments(bind, post_id: int, newest_first: bool) -> Iterator[str]:
+    """Yield a post's comments as NDJSON lines, fetched COMMENT_STREAM_BATCH rows at a time.
+
+    The stream outlives the request's session, so it reads through a
+    session of its own that is closed when the client finishes or goes away.
+    """
+    order = (Comment.created_at.desc(), Comment.id.desc()) if newest_first else (Comment.created_at, Comment.id)
+    with Session(bind=bind) as db:
+        comments = db.query(Comment).options(
+            joinedload(Comment.user)
+        ).filter(
+            Comment.post_id == post_id
+        ).order_by(*order).yield_per(COMMENT_STREAM_BATCH)
+        for comment in comments:
+            yield CommentResponse.from_orm(comment).json() + "\n"
@@ -0,0 +1,166 @@
+"""Response compression negotiated from Accept-Encoding.
+
+Brotli is preferred when the client accepts it and the optional `brotli`
+package is installed, gzip otherwise. Bodies smaller than the threshold,
+already encoded responses and non-text content types are sent as is.
+Streaming responses are compressed chunk by chunk, and every chunk is
+flushed so clients can decode it without waiting for the next one.
+"""
+
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+}
+
+
+def is_compressible(content_type: str) -> bool:
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return media_type.startswith("text/") or media_type in COMPRESSIBLE_TYPES or media_type.endswith("+json")
+
+
+def accepted_encodings(header: str) -> dict:
+    """Map of content codings to their q-values from an Accept-Encoding header"""
+    encodings = {}
+    for item in header.split(","):
+        name, *params = item.strip().split(";")
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            encodings[name.strip().lower()] = quality
+    return encodings
+
+
+def choose_encoding(header: str) -> Optional[str]:
+    encodings = accepted_encodings(header)
+    for name in ("br", "gzip"):
+        if name == "br" and brotli is None:
+            continue
+        if encodings.get(name, encodings.get("*", 0.0)) > 0:
+            return name
+    return None
+
+
+class GzipCompressor:
+    def __init__(self, level: int):
+        # wbits=31 writes a gzip container
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliCompressor:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 4, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            encoding = choose_encoding(Headers(scope=scope).get("Accept-Encoding", ""))
+            if encoding:
+                compressor = (
+                    BrotliCompressor(self.brotli_quality) if encoding == "br"
+                    else GzipCompressor(self.gzip_level)
+                )
+                responder = CompressionResponder(self.app, encoding, compressor, self.minimum_size)
+                await responder(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+class CompressionResponder:
+    """Holds back the response start until the first body chunk decides whether to compress"""
+
+    def __init__(self, app: ASGIApp, encoding: str, compressor, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.compressor = compressor
+        self.minimum_size = minimum_size
+        self.send: Send = None
+        self.initial_message: Message = {}
+        self.started = False
+        self.compressing = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.initial_message = message
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if not self.started:
+            self.started = True
+            headers = MutableHeaders(raw=self.initial_message["headers"])
+            self.compressing = (
+                "content-encoding" not in headers
+                and is_compressible(headers.get("content-type", ""))
+                and (more_body or len(body) >= self.minimum_size)
+            )
+            if self.compressing:
+                headers["Content-Encoding"] = self.encoding
+                headers.add_vary_header("Accept-Encoding")
+                del headers["Content-Length"]
+                if not more_body:
+                    body = self.compressor.compress(body) + self.compressor.finish()
+                    headers["Content-Length"] = str(len(body))
+                    message["body"] = body
+                else:
+                    message["body"] = self.compressor.compress(body) + self.compressor.flush()
+            await self.send(self.initial_message)
+            await self.send(message)
+            return
+
+        if self.compressing:
+            message["body"] = self.compressor.compress(body)
+            message["body"] += self.compressor.flush() if more_body else self.compressor.finish()
+        await self.send(message)
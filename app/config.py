@@ -1,13 +1,78 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 
 
 class Settings(BaseSettings):
     DATABASE_URL: str = "sqlite:///./blog.db"
+    # Serve routers through AsyncSession (aiosqlite / asyncpg) instead of the threadpool
+    DB_ASYNC: bool = False
+    ASYNC_DATABASE_URL: Optional[str] = None
+    
+    # Connection pool, per worker process
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = -1
+    DB_POOL_PRE_PING: bool = False
     REDIS_URL: str = "redis://localhost:6379"
     SECRET_KEY: str = "your-secret-key-change-in-production-09876543210"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     
+    # Password hashing: bcrypt cost and the bounded pool running it
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_QUEUE_LIMIT: int = 32
+    
+    # Authenticated user snapshots; deactivation applies within the TTL
+    AUTH_USER_CACHE_TTL: float = 30.0
+    AUTH_USER_CACHE_SIZE: int = 10000
+    
+    # Post views are buffered and written in batches ("memory" or "redis")
+    VIEW_COUNTER_BACKEND: str = "memory"
+    VIEW_COUNTER_FLUSH_INTERVAL: float = 5.0
+    
+    # Home feed: authors above the limit are read on demand instead of fanned out
+    FEED_FANOUT_LIMIT: int = 10000
+    FEED_BACKFILL_SIZE: int = 20
+    
+    # Tag name -> id cache used when attaching tags to posts
+    TAG_CACHE_SIZE: int = 10000
+    TAG_CACHE_TTL: float = 300.0
+    # Tag listings are served from a snapshot refreshed after this many seconds
+    TAG_SNAPSHOT_TTL: float = 60.0
+    TAG_TRENDING_DAYS: int = 7
+    
+    # Trending posts: score half-life and how often scores are recomputed.
+    # Off by default; set it in exactly one process, concurrent runs double-count events.
+    TRENDING_HALF_LIFE_HOURS: float = 24.0
+    TRENDING_RECOMPUTE_INTERVAL: float = 0.0
+    TRENDING_BACKFILL_HOURS: float = 168.0
+    
+    # Response cache for public GET endpoints ("memory", "redis" or "none")
+    CACHE_BACKEND: str = "memory"
+    CACHE_TTL: int = 60
+    CACHE_MAX_ENTRIES: int = 10000
+    
+    # Cache-Control of public GET responses, in seconds
+    HTTP_CACHE_MAX_AGE: int = 0
+    HTTP_CACHE_STALE_WHILE_REVALIDATE: int = 60
+    
+    # Response compression: smallest body compressed, gzip level and brotli quality
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 4
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    
+    # Add a Server-Timing header (DB, JWT, bcrypt and rendering time) to every response
+    SERVER_TIMING: bool = False
+    
+    # Level of the per-request log (app.requests logger), e.g. INFO, WARNING to silence it
+    REQUEST_LOG_LEVEL: str = "INFO"
+    
+    # Text search configuration for the Postgres full-text index
+    SEARCH_TS_CONFIG: str = "russian"
+    
     class Config:
         env_file = ".env"
 
@@ -1,8 +1,10 @@
 from datetime import datetime
-from sqlalchemy import Boolean, Column, Integer, String, Text, DateTime, ForeignKey, Table
+from sqlalchemy import Boolean, Column, Float, Integer, String, Text, DateTime, ForeignKey, Table, Index, event, false
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 
+from app.config import settings
+
 Base = declarative_base()
 
 # Association tables
@@ -26,16 +28,39 @@ user_subscriptions = Table(
     'user_subscriptions',
     Base.metadata,
     Column('follower_id', Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
-    Column('following_id', Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+    Column('following_id', Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True, index=True),
     Column('subscribed_at', DateTime, default=datetime.utcnow)
 )
 
+# Home feed inboxes, filled by fan-out when posts are created.
+# created_at is the post's creation time, copied for index-only ordering.
+feed_entries = Table(
+    'feed_entries',
+    Base.metadata,
+    Column('user_id', Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+    Column('post_id', Integer, ForeignKey('posts.id', ondelete='CASCADE'), primary_key=True, index=True),
+    Column('created_at', DateTime, nullable=False),
+    Index('ix_feed_entries_user_created_post', 'user_id', 'created_at', 'post_id')
+)
+
 post_reactions = Table(
     'post_reactions',
     Base.metadata,
     Column('user_id', Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+    Column('post_id', Integer, ForeignKey('posts.id', ondelete='CASCADE'), primary_key=True, index=True),
+    Column('reacted_at', DateTime, default=datetime.utcnow, index=True)
+)
+
+# Time-decayed trending scores, maintained by app.trending in the background.
+# views_seen is the post's view_counter already counted into the score.
+post_scores = Table(
+    'post_scores',
+    Base.metadata,
     Column('post_id', Integer, ForeignKey('posts.id', ondelete='CASCADE'), primary_key=True),
-    Column('reacted_at', DateTime, default=datetime.utcnow)
+    Column('score', Float, nullable=False),
+    Column('views_seen', Integer, nullable=False, default=0),
+    Column('computed_at', DateTime, nullable=False),
+    Index('ix_post_scores_score', 'score')
 )
 
 
@@ -51,6 +76,8 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     profile_text = Column(Text)
     avatar_path = Column(String(500))
+    # Set once the follower count passes FEED_FANOUT_LIMIT; such posts are merged into feeds on read
+    is_high_fanout = Column(Boolean, default=False, server_default=false(), nullable=False)
     
     # Relationships
     posts = relationship("Post", back_populates="author", cascade="all, delete-orphan")
@@ -64,6 +91,11 @@ class User(Base):
         backref="following"
     )
     liked_posts = relationship("Post", secondary=post_reactions, back_populates="liked_by")
+    
+    __table_args__ = (
+        # Keyset pagination over active users
+        Index("ix_users_active_id", "is_active", "id"),
+    )
 
 
 class Post(Base):
@@ -77,6 +109,8 @@ class Post(Base):
     modified_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_published = Column(Boolean, default=True)
     view_counter = Column(Integer, default=0)
+    likes_count = Column(Integer, default=0, server_default="0", nullable=False)
+    comments_count = Column(Integer, default=0, server_default="0", nullable=False)
     
     # Relationships
     author = relationship("User", back_populates="posts")
@@ -84,6 +118,12 @@ class Post(Base):
     tags = relationship("Tag", secondary=post_tags, back_populates="posts")
     bookmarked_by = relationship("User", secondary=bookmarks, back_populates="bookmarked_posts")
     liked_by = relationship("User", secondary=post_reactions, back_populates="liked_posts")
+    
+    __table_args__ = (
+        # Keyset pagination: newest published posts and newest posts per author
+        Index("ix_posts_published_created_id", "is_published", "created_at", "id"),
+        Index("ix_posts_user_created_id", "user_id", "created_at", "id"),
+    )
 
 
 class Tag(Base):
@@ -93,6 +133,8 @@ class Tag(Base):
     tag_name = Column(String(50), unique=True, nullable=False, index=True)
     tag_description = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Published posts with the tag, kept in step by app.tags
+    posts_count = Column(Integer, default=0, server_default="0", nullable=False, index=True)
     
     # Relationships
     posts = relationship("Post", secondary=post_tags, back_populates="tags")
@@ -104,9 +146,9 @@ class Comment(Base):
     id = Column(Integer, primary_key=True, index=True)
     post_id = Column(Integer, ForeignKey('posts.id', ondelete='CASCADE'), nullable=False, index=True)
     user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
-    parent_comment_id = Column(Integer, ForeignKey('comments.id'))
+    parent_comment_id = Column(Integer, ForeignKey('comments.id'), index=True)
     comment_text = Column(Text, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     was_edited = Column(Boolean, default=False)
     
@@ -114,3 +156,57 @@ class Comment(Base):
     post = relationship("Post", back_populates="comments")
     user = relationship("User", back_populates="comments")
     replies = relationship("Comment", backref="parent", remote_side=[id])
+
+
+# Full-text search index on post title and content, kept in sync by the database itself
+SQLITE_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5("
+    "post_title, post_content, content='posts', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS posts_fts_ai AFTER INSERT ON posts BEGIN "
+    "INSERT INTO posts_fts(rowid, post_title, post_content) VALUES (new.id, new.post_title, new.post_content); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS posts_fts_ad AFTER DELETE ON posts BEGIN "
+    "INSERT INTO posts_fts(posts_fts, rowid, post_title, post_content) "
+    "VALUES ('delete', old.id, old.post_title, old.post_content); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS posts_fts_au AFTER UPDATE OF post_title, post_content ON posts BEGIN "
+    "INSERT INTO posts_fts(posts_fts, rowid, post_title, post_content) "
+    "VALUES ('delete', old.id, old.post_title, old.post_content); "
+    "INSERT INTO posts_fts(rowid, post_title, post_content) VALUES (new.id, new.post_title, new.post_content); "
+    "END",
+]
+
+POSTGRES_SEARCH_DDL = [
+    "ALTER TABLE posts ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('{config}', coalesce(post_title, '')), 'A') || "
+    "setweight(to_tsvector('{config}', coalesce(post_content, '')), 'B')"
+    ") STORED",
+    "CREATE INDEX IF NOT EXISTS ix_posts_search_vector ON posts USING GIN (search_vector)",
+]
+
+
+def search_index_ddl(dialect_name: str) -> list:
+    """DDL statements creating the full-text index for a dialect"""
+    if dialect_name == "sqlite":
+        return SQLITE_SEARCH_DDL
+    if dialect_name == "postgresql":
+        return [statement.format(config=settings.SEARCH_TS_CONFIG) for statement in POSTGRES_SEARCH_DDL]
+    return []
+
+
+def include_in_migrations(object, name, type_, reflected, compare_to) -> bool:
+    """Alembic autogenerate filter: the full-text tables come from search_index_ddl, not the models"""
+    return not (type_ == "table" and name.startswith("posts_fts"))
+
+
+@event.listens_for(Post.__table__, "after_create")
+def create_search_index(target, connection, **kw):
+    for statement in search_index_ddl(connection.dialect.name):
+        connection.exec_driver_sql(statement)
+
+
+@event.listens_for(Post.__table__, "before_drop")
+def drop_search_index(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql("DROP TABLE IF EXISTS posts_fts")
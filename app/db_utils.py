@@ -1,13 +1,84 @@
+import functools
+import inspect
+
+from fastapi import Depends
+from fastapi.routing import APIRoute
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
+from app.pool_metrics import InstrumentedAsyncQueuePool, InstrumentedQueuePool, instrument_pool
+from app.timing import instrument_engine
+
+
+def pool_options(url: str, pool_class) -> dict:
+    """Pool settings from config; in-memory SQLite keeps its default single-connection pool"""
+    if url.startswith("sqlite") and (":memory:" in url or url.rstrip("/").endswith("sqlite:")):
+        return {}
+    return {
+        "poolclass": pool_class,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
 
 engine = create_engine(
     settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if settings.DATABASE_URL.startswith("sqlite") else {}
+    connect_args={"check_same_thread": False} if settings.DATABASE_URL.startswith("sqlite") else {},
+    **pool_options(settings.DATABASE_URL, InstrumentedQueuePool)
 )
+instrument_pool(engine)
+instrument_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+ASYNC_DRIVERS = {
+    "sqlite://": "sqlite+aiosqlite://",
+    "postgresql://": "postgresql+asyncpg://",
+}
+
+
+def async_database_url(url: str) -> str:
+    """Switch a sync database URL to its async driver"""
+    for prefix, async_prefix in ASYNC_DRIVERS.items():
+        if url.startswith(prefix):
+            return async_prefix + url[len(prefix):]
+    return url
+
+
+def check_async_settings() -> None:
+    """Refuse DB_ASYNC together with a Redis cache or view counter.
+
+    Async endpoints run their sync bodies on the event loop through
+    run_sync, and the Redis backends use the blocking redis client, so
+    every cache or view counter call would stall all requests on the loop
+    instead of one threadpool slot.
+    """
+    redis_backends = [name for name in ("CACHE_BACKEND", "VIEW_COUNTER_BACKEND") if getattr(settings, name) == "redis"]
+    if settings.DB_ASYNC and redis_backends:
+        raise RuntimeError(
+            f"DB_ASYNC cannot be combined with {' and '.join(f'{name}=redis' for name in redis_backends)}: "
+            "the Redis client blocks the event loop"
+        )
+
+
+check_async_settings()
+
+# The async engine is only created when enabled, so its drivers stay optional
+async_engine = None
+if settings.DB_ASYNC:
+    ASYNC_URL = settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL)
+    async_engine = create_async_engine(ASYNC_URL, **pool_options(ASYNC_URL, InstrumentedAsyncQueuePool))
+    instrument_pool(async_engine.sync_engine)
+    instrument_engine(async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False
+)
+
 
 def get_db():
     db = SessionLocal()
@@ -15,3 +86,45 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def async_endpoint(endpoint):
+    """Turn a sync endpoint taking `db: Session` into an async one backed by an AsyncSession.
+
+    The endpoint body runs through AsyncSession.run_sync, so its ORM code
+    (lazy loads included) does non-blocking I/O on the event loop instead
+    of occupying a threadpool slot. Endpoints must build their response
+    schemas themselves: FastAPI validates the return value after run_sync
+    has finished, where a lazy load on a returned ORM object raises
+    MissingGreenlet.
+    """
+    signature = inspect.signature(endpoint)
+    parameters = [
+        param.replace(annotation=AsyncSession, default=Depends(get_async_db)) if param.name == "db" else param
+        for param in signature.parameters.values()
+    ]
+
+    @functools.wraps(endpoint)
+    async def wrapper(db: AsyncSession, **kwargs):
+        return await db.run_sync(lambda session: endpoint(db=session, **kwargs))
+
+    wrapper.__signature__ = signature.replace(parameters=parameters)
+    return wrapper
+
+
+class DatabaseRoute(APIRoute):
+    """Route class serving sync database endpoints as async ones when DB_ASYNC is set"""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        if (
+            settings.DB_ASYNC
+            and not inspect.iscoroutinefunction(endpoint)
+            and "db" in inspect.signature(endpoint).parameters
+        ):
+            endpoint = async_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
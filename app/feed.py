@@ -0,0 +1,126 @@
+"""Home feed of followed authors.
+
+Posts are fanned out on write into the feed_entries inbox of every
+follower, so reading a feed page is one range scan over the reader's
+inbox. Authors with more than FEED_FANOUT_LIMIT followers are flagged
+is_high_fanout and skipped on write; their recent posts are merged into
+the page on read instead.
+"""
+
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import delete, func, literal, select, tuple_
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import Post, User, feed_entries, user_subscriptions
+from app.read_models import post_list_query
+
+
+def fan_out_post(db: Session, post: Post) -> None:
+    """Copy a new post into its author's followers' inboxes (one INSERT ... SELECT)"""
+    author = db.get(User, post.user_id)
+    if author.is_high_fanout:
+        return
+    db.execute(
+        feed_entries.insert().from_select(
+            ["user_id", "post_id", "created_at"],
+            select(
+                user_subscriptions.c.follower_id,
+                literal(post.id),
+                literal(post.created_at)
+            ).where(user_subscriptions.c.following_id == post.user_id)
+        )
+    )
+
+
+def on_follow(db: Session, follower_id: int, author_id: int) -> None:
+    """Flag the author when they outgrow fan-out, otherwise backfill the follower's inbox"""
+    author = db.get(User, author_id)
+    if not author.is_high_fanout:
+        followers = db.execute(
+            select(func.count()).select_from(user_subscriptions).where(
+                user_subscriptions.c.following_id == author_id
+            )
+        ).scalar()
+        if followers > settings.FEED_FANOUT_LIMIT:
+            author.is_high_fanout = True
+            return
+        recent = select(
+            literal(follower_id),
+            Post.id,
+            Post.created_at
+        ).where(
+            Post.user_id == author_id,
+            Post.is_published == True
+        ).order_by(Post.created_at.desc()).limit(settings.FEED_BACKFILL_SIZE)
+        db.execute(feed_entries.insert().from_select(["user_id", "post_id", "created_at"], recent))
+
+
+def on_unfollow(db: Session, follower_id: int, author_id: int) -> None:
+    db.execute(
+        delete(feed_entries).where(
+            feed_entries.c.user_id == follower_id,
+            feed_entries.c.post_id.in_(select(Post.id).where(Post.user_id == author_id))
+        )
+    )
+
+
+def remove_post(db: Session, post_id: int) -> None:
+    db.execute(delete(feed_entries).where(feed_entries.c.post_id == post_id))
+
+
+def remove_user(db: Session, user_id: int) -> None:
+    db.execute(delete(feed_entries).where(feed_entries.c.user_id == user_id))
+    db.execute(
+        delete(feed_entries).where(
+            feed_entries.c.post_id.in_(select(Post.id).where(Post.user_id == user_id))
+        )
+    )
+
+
+def feed_page(
+    db: Session,
+    user_id: int,
+    page_size: int,
+    after: Optional[Tuple[datetime, int]] = None,
+    excerpt_length: Optional[int] = None
+) -> List[Row]:
+    """Newest-first page of post list rows of the user's feed, starting after a (created_at, post_id) key"""
+    inbox = select(feed_entries.c.created_at, feed_entries.c.post_id).join(
+        Post, Post.id == feed_entries.c.post_id
+    ).where(
+        feed_entries.c.user_id == user_id,
+        Post.is_published == True
+    )
+    if after:
+        inbox = inbox.where(tuple_(feed_entries.c.created_at, feed_entries.c.post_id) < after)
+    keys = db.execute(
+        inbox.order_by(feed_entries.c.created_at.desc(), feed_entries.c.post_id.desc()).limit(page_size)
+    ).all()
+
+    # Posts of followed high-fanout authors, read from their (user_id, created_at, id) index
+    pulled = select(Post.created_at, Post.id).join(
+        user_subscriptions, user_subscriptions.c.following_id == Post.user_id
+    ).join(
+        User, User.id == Post.user_id
+    ).where(
+        user_subscriptions.c.follower_id == user_id,
+        User.is_high_fanout == True,
+        Post.is_published == True
+    )
+    if after:
+        pulled = pulled.where(tuple_(Post.created_at, Post.id) < after)
+    keys += db.execute(pulled.order_by(Post.created_at.desc(), Post.id.desc()).limit(page_size)).all()
+
+    # An author flagged later may have posts both in the inbox and pulled
+    page = sorted(set(keys), reverse=True)[:page_size]
+    if not page:
+        return []
+
+    post_ids = [post_id for _, post_id in page]
+    posts = post_list_query(db, excerpt_length).filter(Post.id.in_(post_ids)).all()
+    by_id = {post.id: post for post in posts}
+    return [by_id[post_id] for post_id in post_ids if post_id in by_id]
@@ -0,0 +1,84 @@
+"""Conditional GET support for cached public endpoints.
+
+ResponseCache.store tags a response with a weak ETag (a hash of the
+serialized body) and a Last-Modified time (when the body was built), and
+both are stored with the cache entry. Row timestamps are not used: lists
+and counters change on deletes, retags and likes without any row's
+modified_at moving, while every such write drops the cache entry.
+
+A cache hit restores the validators, so a matching If-None-Match /
+If-Modified-Since is answered with 304 without touching the database.
+That short-circuit depends on the response cache: on a miss, or with
+CACHE_BACKEND=none, the body is queried and serialized before it can be
+compared, and only the transfer is saved.
+"""
+
+import hashlib
+import json
+from datetime import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Optional
+
+from fastapi import Request, Response, status
+
+from app.config import settings
+
+# Headers repeated on a 304, as required for the client to update its stored copy
+NOT_MODIFIED_HEADERS = ("ETag", "Last-Modified", "Cache-Control", "X-Next-Cursor")
+
+
+def etag_for(body: Any) -> str:
+    """Weak ETag of a JSON-compatible body"""
+    payload = json.dumps(body, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return f'W/"{hashlib.sha1(payload.encode("utf-8")).hexdigest()}"'
+
+
+def http_date(moment: datetime) -> str:
+    return format_datetime(moment.replace(microsecond=0), usegmt=True)
+
+
+def set_validators(response: Response, body: Any, last_modified: datetime) -> None:
+    """Set ETag and Last-Modified on a freshly built response body (already JSON-encoded)"""
+    response.headers["ETag"] = etag_for(body)
+    response.headers["Last-Modified"] = http_date(last_modified)
+
+
+def set_public(response: Response) -> None:
+    """Let browsers and shared caches keep the response and serve it stale while revalidating"""
+    response.headers["Cache-Control"] = (
+        f"public, max-age={settings.HTTP_CACHE_MAX_AGE}, "
+        f"stale-while-revalidate={settings.HTTP_CACHE_STALE_WHILE_REVALIDATE}"
+    )
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """Weak comparison against an If-None-Match list"""
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+
+def is_not_modified(request: Request, response: Response) -> bool:
+    etag = response.headers.get("ETag")
+    if_none_match = request.headers.get("If-None-Match")
+    # If-Modified-Since is only considered without If-None-Match
+    if if_none_match is not None:
+        return etag is not None and _etag_matches(if_none_match, etag)
+
+    last_modified = response.headers.get("Last-Modified")
+    if_modified_since = request.headers.get("If-Modified-Since")
+    if last_modified is None or if_modified_since is None:
+        return False
+    try:
+        return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+
+def not_modified(request: Request, response: Response) -> Optional[Response]:
+    """A 304 response when the request's validators match the response's, otherwise None"""
+    if not is_not_modified(request, response):
+        return None
+    headers = {name: response.headers[name] for name in NOT_MODIFIED_HEADERS if name in response.headers}
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
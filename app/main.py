@@ -1,14 +1,47 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.routers import auth, users, posts
+from app.compression import CompressionMiddleware
+from app.db_utils import SessionLocal
+from app.responses import FastJSONResponse
+from app.routers import auth, users, posts, tags, metrics
+from app.timing import TimingMiddleware, configure_request_log
+from app import trending, view_counter
+from app.config import settings
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the view flusher and trending recompute while the app is serving"""
+    tasks = [asyncio.create_task(view_counter.run_flusher(SessionLocal))]
+    if settings.TRENDING_RECOMPUTE_INTERVAL > 0:
+        tasks.append(asyncio.create_task(trending.run_recompute(SessionLocal)))
+    yield
+    for task in tasks:
+        task.cancel()
+    # Persist views collected since the last flush
+    view_counter.flush_with_session(SessionLocal)
+
 
 app = FastAPI(
     title="Chic & Chat - Blog для светских дам",
     description="Элегантная платформа для ведения блога",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
+)
+
+# Compress large text responses (brotli or gzip)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MIN_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
 )
 
 # CORS middleware
@@ -18,8 +51,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified"],
 )
 
+# Outermost, so request timings cover compression and CORS too
+app.add_middleware(TimingMiddleware)
+configure_request_log(settings.REQUEST_LOG_LEVEL)
+
 # Mount static files
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
@@ -30,6 +68,8 @@ templates = Jinja2Templates(directory="app/templates")
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(posts.router)
+app.include_router(tags.router)
+app.include_router(metrics.router)
 
 
 @app.get("/")
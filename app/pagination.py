@@ -0,0 +1,66 @@
+"""Opaque cursors for keyset pagination"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query
+
+from app.database import Post
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*values) -> str:
+    """Pack the sort key of the last row into an opaque url-safe string"""
+    raw = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(raw).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode(cursor: str) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(values, list):
+            raise ValueError
+        return values
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def decode_time_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a (created_at, id) cursor"""
+    values = _decode(cursor)
+    try:
+        created_at, row_id = values
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def decode_id_cursor(cursor: str) -> int:
+    """Decode an id cursor"""
+    values = _decode(cursor)
+    try:
+        (row_id,) = values
+        return int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def paginate_posts(query: Query, page: int, page_size: int, cursor: Optional[str], response: Response) -> list:
+    """Fetch a newest-first page of posts by cursor (or page for old clients) and set the next cursor"""
+    query = query.order_by(Post.created_at.desc(), Post.id.desc())
+    if cursor:
+        created_at, post_id = decode_time_cursor(cursor)
+        query = query.filter(tuple_(Post.created_at, Post.id) < (created_at, post_id))
+    else:
+        query = query.offset((page - 1) * page_size)
+    
+    posts = query.limit(page_size).all()
+    if len(posts) == page_size:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(posts[-1].created_at, posts[-1].id)
+    return posts
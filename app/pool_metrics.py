@@ -0,0 +1,106 @@
+"""Connection pool instrumentation.
+
+The pool classes below time every connection checkout, so a snapshot
+shows how long requests wait for a connection and how often they give up,
+next to the pool's current occupancy.
+"""
+
+import bisect
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Upper bounds of the checkout wait histogram buckets, in milliseconds
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class PoolMetrics:
+    """Checkout wait histogram and timeout counter of one pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+            self.checkouts = 0
+            self.wait_total_ms = 0.0
+            self.wait_max_ms = 0.0
+            self.timeouts = 0
+
+    def observe_wait(self, seconds: float) -> None:
+        wait_ms = seconds * 1000
+        with self._lock:
+            self.buckets[bisect.bisect_left(WAIT_BUCKETS_MS, wait_ms)] += 1
+            self.checkouts += 1
+            self.wait_total_ms += wait_ms
+            self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            cumulative = 0
+            histogram = {}
+            for bound, count in zip(WAIT_BUCKETS_MS, self.buckets):
+                cumulative += count
+                histogram[f"le_{bound}ms"] = cumulative
+            histogram["le_inf"] = cumulative + self.buckets[-1]
+            return {
+                "pool_size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_ms_total": round(self.wait_total_ms, 3),
+                "wait_ms_max": round(self.wait_max_ms, 3),
+                "wait_ms_histogram": histogram,
+            }
+
+
+class InstrumentedPoolMixin:
+    """Times checkouts of a queue pool; metrics survive pool recreation on dispose()"""
+
+    metrics: PoolMetrics = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record_timeout()
+            raise
+        finally:
+            self.metrics.observe_wait(time.perf_counter() - started)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class InstrumentedQueuePool(InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def instrument_pool(engine) -> None:
+    """Attach fresh metrics to an engine created with an instrumented pool class"""
+    if isinstance(engine.pool, InstrumentedPoolMixin):
+        engine.pool.metrics = PoolMetrics()
+
+
+def pool_stats(engine) -> dict:
+    pool = engine.pool
+    if not isinstance(pool, InstrumentedPoolMixin):
+        return {"pool_class": type(pool).__name__}
+    return {"pool_class": type(pool).__name__, **pool.metrics.snapshot(pool)}
@@ -0,0 +1,98 @@
+"""Projected read models for post listings.
+
+List endpoints select only the columns a PostResponse needs, with the
+author joined in the same statement, instead of hydrating Post and User
+ORM objects. Rows stay plain SQLAlchemy Row tuples; tags come from one
+extra query for the whole page. serialize_posts turns them into
+PostResponse-shaped dicts without going through pydantic.
+
+With excerpt_length set, post_content is cut down to that many
+characters by the database, so long posts never leave it in full.
+"""
+
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import func, literal, select
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Query, Session
+
+from app.database import Post, Tag, User, post_tags
+from app.search import snippet_html
+
+EXCERPT_MAX_LENGTH = 2000
+
+
+def post_list_query(db: Session, excerpt_length: Optional[int] = None) -> Query:
+    """Query of post list rows, joined to their authors"""
+    if excerpt_length is None:
+        content = Post.post_content
+        truncated = literal(False)
+    else:
+        content = func.substr(Post.post_content, 1, excerpt_length)
+        truncated = func.length(Post.post_content) > excerpt_length
+    return db.query(
+        Post.id,
+        Post.user_id,
+        Post.post_title,
+        content.label("post_content"),
+        truncated.label("content_truncated"),
+        Post.is_published,
+        Post.created_at,
+        Post.modified_at,
+        Post.view_counter,
+        Post.likes_count,
+        Post.comments_count,
+        User.email.label("author_email"),
+        User.username.label("author_username"),
+        User.created_at.label("author_created_at"),
+        User.is_active.label("author_is_active"),
+        User.profile_text.label("author_profile_text"),
+        User.avatar_path.label("author_avatar_path"),
+    ).join(User, User.id == Post.user_id)
+
+
+def tags_by_post(db: Session, post_ids: Sequence[int]) -> Dict[int, List[dict]]:
+    tags = defaultdict(list)
+    if not post_ids:
+        return tags
+    rows = db.execute(
+        select(post_tags.c.post_id, Tag.id, Tag.tag_name, Tag.tag_description).join(
+            Tag, Tag.id == post_tags.c.tag_id
+        ).where(post_tags.c.post_id.in_(post_ids)).order_by(Tag.id)
+    )
+    for post_id, tag_id, tag_name, tag_description in rows:
+        tags[post_id].append({"id": tag_id, "tag_name": tag_name, "tag_description": tag_description})
+    return tags
+
+
+def serialize_posts(db: Session, rows: Sequence[Row], with_snippets: bool = False) -> List[dict]:
+    """PostResponse dicts of post list rows; with_snippets reads a trailing snippet column"""
+    tags = tags_by_post(db, [row.id for row in rows])
+    return [
+        {
+            "id": row.id,
+            "user_id": row.user_id,
+            "post_title": row.post_title,
+            "post_content": row.post_content,
+            "content_truncated": bool(row.content_truncated),
+            "is_published": row.is_published,
+            "created_at": row.created_at,
+            "modified_at": row.modified_at,
+            "view_counter": row.view_counter,
+            "likes_count": row.likes_count,
+            "comments_count": row.comments_count,
+            "snippet": snippet_html(row[-1]) if with_snippets else None,
+            "author": {
+                "id": row.user_id,
+                "email": row.author_email,
+                "username": row.author_username,
+                "created_at": row.author_created_at,
+                "is_active": row.author_is_active,
+                "profile_text": row.author_profile_text,
+                "avatar_path": row.author_avatar_path,
+            },
+            "tags": tags.get(row.id, []),
+        }
+        for row in rows
+    ]
@@ -0,0 +1,33 @@
+"""orjson response class used app-wide.
+
+Endpoints that already build their bodies from response models (or from
+cached, JSON-encoded data) can return fast_json(...) to skip FastAPI's
+second validation pass against response_model; everything else still
+goes through response_model and is only encoded faster.
+"""
+
+from typing import Any, Optional
+
+import orjson
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+from app.timing import timed
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class FastJSONResponse(ORJSONResponse):
+    def render(self, content: Any) -> bytes:
+        with timed("serialize"):
+            return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def fast_json(content: Any, response: Optional[Response] = None) -> FastJSONResponse:
+    """Encode content without response_model validation, keeping headers set on the endpoint's response"""
+    return FastJSONResponse(content, headers=dict(response.headers) if response is not None else None)
@@ -1,25 +1,36 @@
 from datetime import timedelta
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 
-from app.db_utils import get_db
+from app.db_utils import DatabaseRoute, get_db
 from app.database import User
 from app.schemas import UserCreate, UserResponse, Token
 from app.auth import (
-    verify_password,
-    get_password_hash,
+    verify_password_async,
+    get_password_hash_async,
+    password_needs_rehash,
     create_access_token,
     get_current_active_user
 )
 from app.config import settings
 
-router = APIRouter(prefix="/api/v1/auth", tags=["auth"])
+router = APIRouter(prefix="/api/v1/auth", tags=["auth"], route_class=DatabaseRoute)
 
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     """Register a new user"""
+    # Database work runs on the threadpool, hashing on the dedicated password pool
+    await run_in_threadpool(check_registration_available, db, user_data)
+    password_hash = await get_password_hash_async(user_data.password)
+    
+    return await run_in_threadpool(create_user, db, user_data, password_hash)
+
+
+def check_registration_available(db: Session, user_data: UserCreate) -> None:
     # Check if email exists
     if db.query(User).filter(User.email == user_data.email).first():
         raise HTTPException(
@@ -33,12 +44,13 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already taken"
         )
-    
-    # Create new user
+
+
+def create_user(db: Session, user_data: UserCreate, password_hash: str) -> User:
     new_user = User(
         email=user_data.email,
         username=user_data.username,
-        password_hash=get_password_hash(user_data.password)
+        password_hash=password_hash
     )
     db.add(new_user)
     db.commit()
@@ -48,20 +60,23 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
 
 
 @router.post("/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     """Login and get access token"""
     # Try to find user by username or email
-    user = db.query(User).filter(
-        (User.username == form_data.username) | (User.email == form_data.username)
-    ).first()
+    user = await run_in_threadpool(find_login_user, db, form_data.username)
     
-    if not user or not verify_password(form_data.password, user.password_hash):
+    if not user or not await verify_password_async(form_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Upgrade hashes made with an outdated cost factor while the password is at hand
+    if password_needs_rehash(user.password_hash):
+        user.password_hash = await get_password_hash_async(form_data.password)
+        await run_in_threadpool(db.commit)
+    
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": str(user.id)}, expires_delta=access_token_expires
@@ -70,7 +85,13 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     return {"access_token": access_token, "token_type": "bearer"}
 
 
+def find_login_user(db: Session, login: str) -> Optional[User]:
+    return db.query(User).filter(
+        (User.username == login) | (User.email == login)
+    ).first()
+
+
 @router.get("/me", response_model=UserResponse)
-def get_current_user_info(current_user: User = Depends(get_current_active_user)):
+def get_current_user_info(current_user: UserResponse = Depends(get_current_active_user)):
     """Get current user information"""
     return current_user
@@ -0,0 +1,22 @@
+from fastapi import APIRouter
+
+from app.cache import response_cache
+from app.db_utils import engine, async_engine
+from app.pool_metrics import pool_stats
+
+router = APIRouter(prefix="/api/v1/metrics", tags=["metrics"])
+
+
+@router.get("/cache")
+def get_cache_metrics():
+    """Response cache hit and miss counters"""
+    return response_cache.stats()
+
+
+@router.get("/db-pool")
+def get_db_pool_metrics():
+    """Connection pool occupancy, checkout wait histogram and timeouts"""
+    stats = {"sync": pool_stats(engine)}
+    if async_engine is not None:
+        stats["async"] = pool_stats(async_engine.sync_engine)
+    return stats
@@ -1,58 +1,93 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, or_
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, select, tuple_, update
 
-from app.db_utils import get_db
-from app.database import Post, Tag, Comment, post_tags, bookmarks, post_reactions
-from app.schemas import PostCreate, PostUpdate, PostResponse, CommentCreate, CommentResponse, TagResponse
+from app.db_utils import DatabaseRoute, get_db
+from app.database import Post, Tag, Comment, post_tags, bookmarks, post_reactions, post_scores
+from app.schemas import (
+    PostCreate, PostUpdate, PostResponse, PostBatchRequest, PostWithViewerFlags, CommentCreate, CommentResponse, CommentTreeResponse,
+    TagResponse, UserResponse
+)
 from app.auth import get_current_active_user, get_optional_user
-from app.database import User
+from app.view_counter import view_buffer
+from app.pagination import NEXT_CURSOR_HEADER, decode_time_cursor, encode_cursor, paginate_posts
+from app.search import search_posts
+from app.cache import response_cache, post_list_deps
+from app.http_cache import not_modified, set_public
+from app.responses import fast_json
+from app.read_models import EXCERPT_MAX_LENGTH, post_list_query, serialize_posts
+from app import feed
+from app.tags import adjust_posts_count, post_tag_ids, set_post_tags
+from app.comments import NDJSON_MEDIA_TYPE, comment_tree, stream_bind, stream_comments
 
-router = APIRouter(prefix="/api/v1/posts", tags=["posts"])
+router = APIRouter(prefix="/api/v1/posts", tags=["posts"], route_class=DatabaseRoute)
 
 
 @router.get("", response_model=List[PostResponse])
 def get_posts(
-    search: Optional[str] = Query(None, description="Search in title and content"),
+    request: Request,
+    response: Response,
+    search: Optional[str] = Query(None, description="Full-text search in title and content"),
     tag: Optional[str] = Query(None, description="Filter by tag name"),
+    highlight: bool = Query(False, description="Add a highlighted snippet to search results"),
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header, overrides page"),
+    excerpt_length: Optional[int] = Query(None, ge=1, le=EXCERPT_MAX_LENGTH, description="Cut post_content to an excerpt"),
     db: Session = Depends(get_db)
 ):
     """Get all posts with pagination, search and filtering - PUBLIC endpoint"""
-    query = db.query(Post).filter(Post.is_published == True)
-    
-    if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            or_(
-                Post.post_title.ilike(search_term),
-                Post.post_content.ilike(search_term)
-            )
-        )
+    cache_key = response_cache.make_key(
+        "posts",
+        search=search.strip() if search else None,
+        tag=tag.lower() if tag else None,
+        highlight=highlight or None,
+        page=None if cursor else page,
+        page_size=page_size,
+        cursor=cursor,
+        excerpt=excerpt_length
+    )
+    set_public(response)
+    cached = response_cache.load(cache_key, response)
+    if cached is not None:
+        return not_modified(request, response) or fast_json(cached, response)
+    
+    # Projected rows with the author joined, tags are loaded in bulk for the whole page
+    query = post_list_query(db, excerpt_length).filter(Post.is_published == True)
     
     if tag:
-        query = query.join(Post.tags).filter(Tag.tag_name == tag.lower())
+        query = query.join(post_tags, post_tags.c.post_id == Post.id).join(
+            Tag, Tag.id == post_tags.c.tag_id
+        ).filter(Tag.tag_name == tag.lower())
+    
+    if not search:
+        posts = paginate_posts(query, page, page_size, cursor, response)
+        result = serialize_posts(db, posts)
+        result = response_cache.store(cache_key, result, post_list_deps(posts, "posts"), response)
+        return not_modified(request, response) or fast_json(result, response)
+    
+    # Search results are ordered by relevance, so only page pagination applies
+    if cursor:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor pagination is not supported with search"
+        )
     
-    total = query.count()
-    posts = query.order_by(Post.created_at.desc()).offset((page - 1) * page_size).limit(page_size).all()
+    query, with_snippets = search_posts(query, search, highlight)
+    posts = query.offset((page - 1) * page_size).limit(page_size).all()
+    result = serialize_posts(db, posts, with_snippets)
     
-    # Add counts
-    result = []
-    for post in posts:
-        post_dict = PostResponse.from_orm(post)
-        post_dict.likes_count = len(post.liked_by)
-        post_dict.comments_count = len(post.comments)
-        result.append(post_dict)
-    
-    return result
+    result = response_cache.store(cache_key, result, post_list_deps(posts, "posts"), response)
+    return not_modified(request, response) or fast_json(result, response)
 
 
 @router.post("", response_model=PostResponse, status_code=status.HTTP_201_CREATED)
 def create_post(
     post_data: PostCreate,
-    current_user: User = Depends(get_current_active_user),
+    current_user: UserResponse = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Create a new post"""
@@ -63,53 +98,119 @@ def create_post(
         is_published=post_data.is_published
     )
     
-    # Handle tags
-    if post_data.tag_names:
-        for tag_name in post_data.tag_names:
-            tag_name = tag_name.lower().strip()
-            tag = db.query(Tag).filter(Tag.tag_name == tag_name).first()
-            if not tag:
-                tag = Tag(tag_name=tag_name)
-                db.add(tag)
-            new_post.tags.append(tag)
-    
     db.add(new_post)
+    db.flush()
+    if post_data.tag_names:
+        tag_ids = set_post_tags(db, new_post.id, post_data.tag_names)
+        if new_post.is_published:
+            adjust_posts_count(db, set(), tag_ids)
+    feed.fan_out_post(db, new_post)
     db.commit()
     db.refresh(new_post)
+    response_cache.invalidate("posts", f"user-posts:{current_user.id}", f"user-stats:{current_user.id}")
     
-    post_dict = PostResponse.from_orm(new_post)
-    post_dict.likes_count = 0
-    post_dict.comments_count = 0
+    return PostResponse.from_orm(new_post)
+
+
+@router.get("/trending", response_model=List[PostResponse])
+def get_trending_posts(
+    limit: int = Query(10, ge=1, le=50),
+    excerpt_length: Optional[int] = Query(None, ge=1, le=EXCERPT_MAX_LENGTH, description="Cut post_content to an excerpt"),
+    db: Session = Depends(get_db)
+):
+    """Get posts ranked by time-decayed likes, comments and views - PUBLIC endpoint"""
+    cache_key = response_cache.make_key("trending", limit=limit, excerpt=excerpt_length)
+    cached = response_cache.load(cache_key)
+    if cached is not None:
+        return fast_json(cached)
+    
+    # Scores are maintained in the background, this is a walk down their index
+    posts = post_list_query(db, excerpt_length).join(
+        post_scores, post_scores.c.post_id == Post.id
+    ).filter(
+        Post.is_published == True
+    ).order_by(post_scores.c.score.desc(), Post.id.desc()).limit(limit).all()
+    result = serialize_posts(db, posts)
+    return fast_json(response_cache.store(cache_key, result, post_list_deps(posts, "trending")))
+
+
+@router.post("/batch", response_model=List[PostWithViewerFlags])
+def get_posts_batch(
+    batch: PostBatchRequest,
+    current_user: Optional[UserResponse] = Depends(get_optional_user),
+    db: Session = Depends(get_db)
+):
+    """Get published posts by id, in request order, with the viewer's like and bookmark flags - PUBLIC endpoint"""
+    post_ids = list(dict.fromkeys(batch.post_ids))
+    posts = post_list_query(db).filter(
+        Post.id.in_(post_ids),
+        Post.is_published == True
+    ).all()
+    by_id = {post["id"]: post for post in serialize_posts(db, posts)}
+    
+    liked = bookmarked = set()
+    if current_user and posts:
+        liked = set(db.execute(
+            select(post_reactions.c.post_id).where(
+                post_reactions.c.user_id == current_user.id,
+                post_reactions.c.post_id.in_(by_id)
+            )
+        ).scalars())
+        bookmarked = set(db.execute(
+            select(bookmarks.c.post_id).where(
+                bookmarks.c.user_id == current_user.id,
+                bookmarks.c.post_id.in_(by_id)
+            )
+        ).scalars())
     
-    return post_dict
+    result = []
+    for post_id in post_ids:
+        if post_id in by_id:
+            result.append({
+                **by_id[post_id],
+                "liked_by_me": post_id in liked,
+                "bookmarked_by_me": post_id in bookmarked
+            })
+    return fast_json(result)
 
 
 @router.get("/{post_id}", response_model=PostResponse)
 def get_post(
     post_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db)
 ):
     """Get specific post by ID - PUBLIC endpoint"""
-    post = db.query(Post).filter(Post.id == post_id, Post.is_published == True).first()
-    if not post:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
-    
-    # Increment view counter
-    post.view_counter += 1
-    db.commit()
+    cache_key = response_cache.make_key("post", id=post_id)
+    set_public(response)
+    post_dict = response_cache.load(cache_key, response)
+    if post_dict is None:
+        post = db.query(Post).filter(Post.id == post_id, Post.is_published == True).first()
+        if not post:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
+        post_dict = response_cache.store(
+            cache_key,
+            jsonable_encoder(PostResponse.from_orm(post)),
+            [f"post:{post_id}", f"post-views:{post_id}", f"user:{post.user_id}"],
+            response
+        )
     
-    post_dict = PostResponse.from_orm(post)
-    post_dict.likes_count = len(post.liked_by)
-    post_dict.comments_count = len(post.comments)
+    # Views are buffered and flushed in batches, so reads never write
+    view_buffer.record(post_id)
     
-    return post_dict
+    # The weak ETag covers the flushed view counter, buffered views do not change it
+    unchanged = not_modified(request, response)
+    if unchanged:
+        return unchanged
+    return fast_json({**post_dict, "view_counter": post_dict["view_counter"] + view_buffer.pending(post_id)}, response)
 
 
 @router.put("/{post_id}", response_model=PostResponse)
 def update_post(
     post_id: int,
     post_update: PostUpdate,
-    current_user: User = Depends(get_current_active_user),
+    current_user: UserResponse = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Update a post"""
@@ -123,6 +224,12 @@ def update_post(
             detail="Can only edit own posts"
         )
     
+    # Tag post counts only include published posts
+    was_published = post.is_published
+    tags_before = tags_after = None
+    if post_update.tag_names is not None or post_update.is_published is not None:
+        tags_before = tags_after = post_tag_ids(db, post.id)
+    
     if post_update.post_title is not None:
         post.post_title = post_update.post_title
     
@@ -134,29 +241,26 @@ def update_post(
     
     # Update tags
     if post_update.tag_names is not None:
-        post.tags.clear()
-        for tag_name in post_update.tag_names:
-            tag_name = tag_name.lower().strip()
-            tag = db.query(Tag).filter(Tag.tag_name == tag_name).first()
-            if not tag:
-                tag = Tag(tag_name=tag_name)
-                db.add(tag)
-            post.tags.append(tag)
+        tags_after = set_post_tags(db, post.id, post_update.tag_names, replace=True)
+    
+    if tags_before is not None:
+        adjust_posts_count(
+            db,
+            tags_before if was_published else set(),
+            tags_after if post.is_published else set()
+        )
     
     db.commit()
     db.refresh(post)
+    response_cache.invalidate("posts", f"post:{post_id}", f"user-posts:{post.user_id}")
     
-    post_dict = PostResponse.from_orm(post)
-    post_dict.likes_count = len(post.liked_by)
-    post_dict.comments_count = len(post.comments)
-    
-    return post_dict
+    return PostResponse.from_orm(post)
 
 
 @router.delete("/{post_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_post(
     post_id: int,
-    current_user: User = Depends(get_current_active_user),
+    current_user: UserResponse = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Delete a post"""
@@ -170,15 +274,25 @@ def delete_post(
             detail="Can only delete own posts"
         )
     
+    if post.is_published:
+        adjust_posts_count(db, post_tag_ids(db, post_id), set())
+    feed.remove_post(db, post_id)
     db.delete(post)
     db.commit()
+    response_cache.invalidate(
+        "posts",
+        f"post:{post_id}",
+        f"comments:{post_id}",
+        f"user-posts:{current_user.id}",
+        f"user-stats:{current_user.id}"
+    )
     return None
 
 
 @router.post("/{post_id}/like", status_code=status.HTTP_200_OK)
 def like_post(
     post_id: int,
-    current_user: User = Depends(get_current_active_user),
+    current_user: UserResponse = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Like a post"""
@@ -206,7 +320,12 @@ def like_post(
             post_id=post_id
         )
     )
+    # A counter change is not an edit, so modified_at keeps its value instead of taking its onupdate
+    db.execute(
+        update(Post).where(Post.id == post_id).values(likes_count=Post.likes_count + 1, modified_at=Post.modified_at)
+    )
     db.commit()
+    response_cache.invalidate(f"post:{post_id}")
     
     return {"message": "Post liked successfully"}
 
@@ -214,7 +333,7 @@ def like_post(
 @router.delete("/{post_id}/like", status_code=status.HTTP_200_OK)
 def unlike_post(
     post_id: int,
-    current_user: User = Depends(get_current_active_user),
+    current_user: UserResponse = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Unlike a post"""
@@ -224,7 +343,12 @@ def unlike_post(
             post_reactions.c.post_id == post_id
         )
     )
+    if result.rowcount:
+        db.execute(
+            update(Post).where(Post.id == post_id).values(likes_count=Post.likes_count - 1, modified_at=Post.modified_at)
+        )
     db.commit()
+    response_cache.invalidate(f"post:{post_id}")
     
     if result.rowcount == 0:
         raise HTTPException(
@@ -238,7 +362,7 @@ def unlike_post(
 @router.post("/{post_id}/bookmark", status_code=status.HTTP_200_OK)
 def bookmark_post(
     post_id: int,
-    current_user: User = Depends(get_current_active_user),
+    current_user: UserResponse = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Bookmark a post"""
@@ -274,7 +398,7 @@ def bookmark_post(
 @router.delete("/{post_id}/bookmark", status_code=status.HTTP_200_OK)
 def unbookmark_post(
     post_id: int,
-    current_user: User = Depends(get_current_active_user),
+    current_user: UserResponse = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Remove post from bookmarks"""
@@ -298,22 +422,102 @@ def unbookmark_post(
 @router.get("/{post_id}/comments", response_model=List[CommentResponse])
 def get_post_comments(
     post_id: int,
+    request: Request,
+    response: Response,
+    order: Literal["newest", "oldest"] = Query("newest", description="Sort by creation time"),
+    page_size: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header"),
+    stream: bool = Query(False, description="Stream all comments as NDJSON instead of one page"),
     db: Session = Depends(get_db)
 ):
-    """Get all comments for a post - PUBLIC endpoint"""
+    """Get comments for a post page by page, or all of them as an NDJSON stream - PUBLIC endpoint"""
+    newest_first = order == "newest"
+    cache_key = response_cache.make_key(
+        "comments",
+        post_id=post_id,
+        order=order,
+        page_size=page_size,
+        cursor=cursor
+    )
+    if not stream:
+        set_public(response)
+        cached = response_cache.load(cache_key, response)
+        if cached is not None:
+            return not_modified(request, response) or fast_json(cached, response)
+    
     post = db.query(Post).filter(Post.id == post_id).first()
     if not post:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
     
-    comments = db.query(Comment).filter(Comment.post_id == post_id).order_by(Comment.created_at.desc()).all()
-    return comments
+    if stream:
+        return StreamingResponse(
+            stream_comments(stream_bind(db), post_id, newest_first),
+            media_type=NDJSON_MEDIA_TYPE
+        )
+    
+    sort_key = tuple_(Comment.created_at, Comment.id)
+    query = db.query(Comment).options(joinedload(Comment.user)).filter(Comment.post_id == post_id)
+    if newest_first:
+        query = query.order_by(Comment.created_at.desc(), Comment.id.desc())
+    else:
+        query = query.order_by(Comment.created_at, Comment.id)
+    if cursor:
+        after = decode_time_cursor(cursor)
+        query = query.filter(sort_key < after if newest_first else sort_key > after)
+    
+    comments = query.limit(page_size).all()
+    if len(comments) == page_size:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(comments[-1].created_at, comments[-1].id)
+    deps = [f"comments:{post_id}"] + [f"user:{user_id}" for user_id in {c.user_id for c in comments}]
+    result = response_cache.store(cache_key, [CommentResponse.from_orm(c) for c in comments], deps, response)
+    return not_modified(request, response) or fast_json(result, response)
+
+
+@router.get("/{post_id}/comments/tree", response_model=List[CommentTreeResponse])
+def get_post_comment_tree(
+    post_id: int,
+    max_depth: int = Query(3, ge=1, le=10, description="Levels of replies to include, top level counts as one"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100, description="Top-level comments per page"),
+    replies_limit: int = Query(10, ge=1, le=100, description="Replies shown under each comment"),
+    parent_id: Optional[int] = Query(None, description="Page through the replies of this comment instead"),
+    db: Session = Depends(get_db)
+):
+    """Get comments of a post as nested threads - PUBLIC endpoint"""
+    cache_key = response_cache.make_key(
+        "comment-tree",
+        post_id=post_id,
+        max_depth=max_depth,
+        page=page,
+        page_size=page_size,
+        replies_limit=replies_limit,
+        parent_id=parent_id
+    )
+    cached = response_cache.load(cache_key)
+    if cached is not None:
+        return fast_json(cached)
+    
+    post = db.query(Post).filter(Post.id == post_id).first()
+    if not post:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
+    
+    if parent_id is not None:
+        parent = db.query(Comment.id).filter(Comment.id == parent_id, Comment.post_id == post_id).first()
+        if not parent:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Parent comment not found")
+    
+    tree, user_ids = comment_tree(
+        db, post_id, max_depth, (page - 1) * page_size, page_size, replies_limit, parent_id
+    )
+    deps = [f"comments:{post_id}"] + [f"user:{user_id}" for user_id in user_ids]
+    return fast_json(response_cache.store(cache_key, tree, deps))
 
 
 @router.post("/{post_id}/comments", response_model=CommentResponse, status_code=status.HTTP_201_CREATED)
 def create_comment(
     post_id: int,
     comment_data: CommentCreate,
-    current_user: User = Depends(get_current_active_user),
+    current_user: UserResponse = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Create a comment on a post"""
@@ -341,7 +545,11 @@ def create_comment(
     )
     
     db.add(new_comment)
+    db.execute(
+        update(Post).where(Post.id == post_id).values(comments_count=Post.comments_count + 1, modified_at=Post.modified_at)
+    )
     db.commit()
+    response_cache.invalidate(f"post:{post_id}", f"comments:{post_id}")
     db.refresh(new_comment)
     
-    return new_comment
+    return CommentResponse.from_orm(new_comment)
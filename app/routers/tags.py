@@ -0,0 +1,22 @@
+from typing import List, Literal
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.db_utils import DatabaseRoute, get_db
+from app.schemas import TagStatsResponse
+from app.tags import tag_listing
+
+router = APIRouter(prefix="/api/v1/tags", tags=["tags"], route_class=DatabaseRoute)
+
+
+@router.get("", response_model=List[TagStatsResponse])
+def get_tags(
+    sort: Literal["popular", "trending"] = Query("popular", description="All-time post count or recent activity"),
+    days: int = Query(settings.TAG_TRENDING_DAYS, ge=1, le=90, description="Trending window in days"),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """Get tags with their published post counts - PUBLIC endpoint"""
+    return tag_listing(db, sort, limit, days)
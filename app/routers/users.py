@@ -1,24 +1,52 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import func, or_
+from sqlalchemy import func, or_, select, update
 
-from app.db_utils import get_db
-from app.database import User, Post, user_subscriptions, bookmarks
+from app.db_utils import DatabaseRoute, get_db
+from app.database import User, Post, Comment, user_subscriptions, bookmarks, post_reactions
 from app.schemas import UserResponse, UserUpdate, UserWithStats, PostResponse
-from app.auth import get_current_active_user, get_optional_user
+from app.auth import get_current_active_user, get_optional_user, invalidate_cached_user
+from app.pagination import NEXT_CURSOR_HEADER, decode_id_cursor, decode_time_cursor, encode_cursor, paginate_posts
+from app.cache import response_cache, post_list_deps
+from app.http_cache import not_modified, set_public
+from app.responses import fast_json
+from app.read_models import EXCERPT_MAX_LENGTH, post_list_query, serialize_posts
+from app import feed
+from app.tags import remove_user_posts
 
-router = APIRouter(prefix="/api/v1/users", tags=["users"])
+router = APIRouter(prefix="/api/v1/users", tags=["users"], route_class=DatabaseRoute)
+
+
+def user_stats_columns():
+    """Post, follower and following counts as correlated subqueries, computed in the user query itself"""
+    posts_count = select(func.count(Post.id)).where(Post.user_id == User.id).scalar_subquery()
+    followers_count = select(func.count()).select_from(user_subscriptions).where(
+        user_subscriptions.c.following_id == User.id
+    ).scalar_subquery()
+    following_count = select(func.count()).select_from(user_subscriptions).where(
+        user_subscriptions.c.follower_id == User.id
+    ).scalar_subquery()
+    return posts_count, followers_count, following_count
+
+
+def with_stats(row) -> UserWithStats:
+    user, posts_count, followers_count, following_count = row
+    user_dict = UserWithStats.from_orm(user)
+    user_dict.posts_count = posts_count
+    user_dict.followers_count = followers_count
+    user_dict.following_count = following_count
+    return user_dict
 
 
 @router.get("/me/bookmarks", response_model=List[PostResponse])
 def get_my_bookmarks(
-    current_user: User = Depends(get_current_active_user),
+    current_user: UserResponse = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Get current user's bookmarked posts"""
     # Get all bookmarked posts for current user
-    posts = db.query(Post).join(
+    posts = post_list_query(db).join(
         bookmarks,
         Post.id == bookmarks.c.post_id
     ).filter(
@@ -26,26 +54,38 @@ def get_my_bookmarks(
         Post.is_published == True
     ).order_by(Post.created_at.desc()).all()
     
-    # Add counts
-    result = []
-    for post in posts:
-        post_dict = PostResponse.from_orm(post)
-        post_dict.likes_count = len(post.liked_by)
-        post_dict.comments_count = len(post.comments)
-        result.append(post_dict)
+    return fast_json(serialize_posts(db, posts))
+
+
+@router.get("/me/feed", response_model=List[PostResponse])
+def get_my_feed(
+    response: Response,
+    page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header"),
+    excerpt_length: Optional[int] = Query(None, ge=1, le=EXCERPT_MAX_LENGTH, description="Cut post_content to an excerpt"),
+    current_user: UserResponse = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get newest posts of followed users"""
+    after = decode_time_cursor(cursor) if cursor else None
+    posts = feed.feed_page(db, current_user.id, page_size, after, excerpt_length)
+    if len(posts) == page_size:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(posts[-1].created_at, posts[-1].id)
     
-    return result
+    return fast_json(serialize_posts(db, posts), response)
 
 
 @router.get("", response_model=List[UserWithStats])
 def get_users(
+    response: Response,
     search: Optional[str] = Query(None, description="Search by username or email"),
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header, overrides page"),
     db: Session = Depends(get_db)
 ):
     """Get all users with pagination and search"""
-    query = db.query(User).filter(User.is_active == True)
+    query = db.query(User, *user_stats_columns()).filter(User.is_active == True)
     
     if search:
         search_term = f"%{search}%"
@@ -56,49 +96,41 @@ def get_users(
             )
         )
     
-    total = query.count()
-    users = query.offset((page - 1) * page_size).limit(page_size).all()
+    query = query.order_by(User.id)
+    if cursor:
+        query = query.filter(User.id > decode_id_cursor(cursor))
+    else:
+        query = query.offset((page - 1) * page_size)
     
-    # Add stats to users
-    result = []
-    for user in users:
-        user_dict = UserWithStats.from_orm(user)
-        user_dict.posts_count = db.query(func.count(Post.id)).filter(Post.user_id == user.id).scalar()
-        user_dict.followers_count = db.query(func.count(user_subscriptions.c.follower_id)).filter(
-            user_subscriptions.c.following_id == user.id
-        ).scalar()
-        user_dict.following_count = db.query(func.count(user_subscriptions.c.following_id)).filter(
-            user_subscriptions.c.follower_id == user.id
-        ).scalar()
-        result.append(user_dict)
+    rows = query.limit(page_size).all()
+    if len(rows) == page_size:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1][0].id)
     
-    return result
+    return [with_stats(row) for row in rows]
 
 
 @router.get("/{user_id}", response_model=UserWithStats)
-def get_user(user_id: int, db: Session = Depends(get_db)):
+def get_user(user_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
     """Get specific user by ID"""
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    cache_key = response_cache.make_key("user", id=user_id)
+    set_public(response)
+    cached = response_cache.load(cache_key, response)
+    if cached is not None:
+        return not_modified(request, response) or fast_json(cached, response)
     
-    user_dict = UserWithStats.from_orm(user)
-    user_dict.posts_count = db.query(func.count(Post.id)).filter(Post.user_id == user.id).scalar()
-    user_dict.followers_count = db.query(func.count(user_subscriptions.c.follower_id)).filter(
-        user_subscriptions.c.following_id == user.id
-    ).scalar()
-    user_dict.following_count = db.query(func.count(user_subscriptions.c.following_id)).filter(
-        user_subscriptions.c.follower_id == user.id
-    ).scalar()
+    row = db.query(User, *user_stats_columns()).filter(User.id == user_id).first()
+    if not row:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     
-    return user_dict
+    result = response_cache.store(cache_key, with_stats(row), [f"user:{user_id}", f"user-stats:{user_id}"], response)
+    return not_modified(request, response) or fast_json(result, response)
 
 
 @router.put("/{user_id}", response_model=UserResponse)
 def update_user(
     user_id: int,
     user_update: UserUpdate,
-    current_user: User = Depends(get_current_active_user),
+    current_user: UserResponse = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Update user information"""
@@ -138,13 +170,15 @@ def update_user(
     
     db.commit()
     db.refresh(user)
-    return user
+    invalidate_cached_user(user_id)
+    response_cache.invalidate(f"user:{user_id}")
+    return UserResponse.from_orm(user)
 
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_user(
     user_id: int,
-    current_user: User = Depends(get_current_active_user),
+    current_user: UserResponse = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Delete user account"""
@@ -158,43 +192,75 @@ def delete_user(
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     
+    # Keep counters on other posts in step with the cascading like and comment deletes
+    db.execute(
+        update(Post).where(
+            Post.id.in_(select(post_reactions.c.post_id).where(post_reactions.c.user_id == user_id))
+        ).values(likes_count=Post.likes_count - 1, modified_at=Post.modified_at)
+    )
+    user_comments = select(func.count(Comment.id)).where(
+        Comment.post_id == Post.id,
+        Comment.user_id == user_id
+    ).scalar_subquery()
+    db.execute(
+        update(Post).where(
+            Post.id.in_(select(Comment.post_id).where(Comment.user_id == user_id))
+        ).values(comments_count=Post.comments_count - user_comments, modified_at=Post.modified_at)
+    )
+    
+    remove_user_posts(db, user_id)
+    feed.remove_user(db, user_id)
     db.delete(user)
     db.commit()
+    invalidate_cached_user(user_id)
+    # Posts, comments, counters and follower stats of many users change at once
+    response_cache.clear()
     return None
 
 
 @router.get("/{user_id}/posts", response_model=List[PostResponse])
 def get_user_posts(
     user_id: int,
+    request: Request,
+    response: Response,
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header, overrides page"),
+    excerpt_length: Optional[int] = Query(None, ge=1, le=EXCERPT_MAX_LENGTH, description="Cut post_content to an excerpt"),
     db: Session = Depends(get_db)
 ):
     """Get all posts by a specific user - PUBLIC endpoint"""
+    cache_key = response_cache.make_key(
+        "user-posts",
+        user_id=user_id,
+        page=None if cursor else page,
+        page_size=page_size,
+        cursor=cursor,
+        excerpt=excerpt_length
+    )
+    set_public(response)
+    cached = response_cache.load(cache_key, response)
+    if cached is not None:
+        return not_modified(request, response) or fast_json(cached, response)
+    
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     
     # Show only published posts for public access
-    query = db.query(Post).filter(Post.user_id == user_id, Post.is_published == True)
-    
-    posts = query.order_by(Post.created_at.desc()).offset((page - 1) * page_size).limit(page_size).all()
-    
-    # Add counts
-    result = []
-    for post in posts:
-        post_dict = PostResponse.from_orm(post)
-        post_dict.likes_count = len(post.liked_by)
-        post_dict.comments_count = len(post.comments)
-        result.append(post_dict)
+    query = post_list_query(db, excerpt_length).filter(Post.user_id == user_id, Post.is_published == True)
+    posts = paginate_posts(query, page, page_size, cursor, response)
     
-    return result
+    result = serialize_posts(db, posts)
+    deps = post_list_deps(posts, f"user-posts:{user_id}", f"user:{user_id}")
+    result = response_cache.store(cache_key, result, deps, response)
+    return not_modified(request, response) or fast_json(result, response)
 
 
 @router.post("/{user_id}/follow", status_code=status.HTTP_200_OK)
 def follow_user(
     user_id: int,
-    current_user: User = Depends(get_current_active_user),
+    current_user: UserResponse = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Follow a user"""
@@ -228,7 +294,9 @@ def follow_user(
             following_id=user_id
         )
     )
+    feed.on_follow(db, current_user.id, user_id)
     db.commit()
+    response_cache.invalidate(f"user-stats:{current_user.id}", f"user-stats:{user_id}")
     
     return {"message": "Successfully followed user"}
 
@@ -236,7 +304,7 @@ def follow_user(
 @router.delete("/{user_id}/follow", status_code=status.HTTP_200_OK)
 def unfollow_user(
     user_id: int,
-    current_user: User = Depends(get_current_active_user),
+    current_user: UserResponse = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Unfollow a user"""
@@ -246,7 +314,10 @@ def unfollow_user(
             user_subscriptions.c.following_id == user_id
         )
     )
+    if result.rowcount:
+        feed.on_unfollow(db, current_user.id, user_id)
     db.commit()
+    response_cache.invalidate(f"user-stats:{current_user.id}", f"user-stats:{user_id}")
     
     if result.rowcount == 0:
         raise HTTPException(
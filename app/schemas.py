@@ -102,11 +102,34 @@ class PostResponse(PostBase):
     tags: List[TagResponse] = []
     likes_count: int = 0
     comments_count: int = 0
+    content_truncated: bool = False
+    # Safe HTML: escaped post text with <mark> around matches
+    snippet: Optional[str] = None
     
     class Config:
         from_attributes = True
 
 
+POST_BATCH_LIMIT = 100
+
+
+class PostBatchRequest(BaseModel):
+    post_ids: List[int]
+
+    @validator("post_ids")
+    def post_ids_limit(cls, v: List[int]) -> List[int]:
+        if not v:
+            raise ValueError("post_ids cannot be empty")
+        if len(v) > POST_BATCH_LIMIT:
+            raise ValueError(f"Too many posts (max {POST_BATCH_LIMIT})")
+        return v
+
+
+class PostWithViewerFlags(PostResponse):
+    liked_by_me: bool = False
+    bookmarked_by_me: bool = False
+
+
 # Comment schemas
 class CommentBase(BaseModel):
     comment_text: str
@@ -140,6 +163,11 @@ class CommentResponse(CommentBase):
         from_attributes = True
 
 
+class CommentTreeResponse(CommentResponse):
+    replies_count: int = 0
+    replies: List["CommentTreeResponse"] = []
+
+
 # Auth schemas
 class Token(BaseModel):
     access_token: str
@@ -151,6 +179,11 @@ class TokenData(BaseModel):
 
 
 # Tag schemas
+class TagStatsResponse(TagResponse):
+    posts_count: int
+    recent_posts_count: Optional[int] = None
+
+
 class TagCreate(BaseModel):
     tag_name: str
     tag_description: Optional[str] = None
@@ -0,0 +1,99 @@
+"""Relevance-ranked full-text search over posts.
+
+SQLite uses the FTS5 table posts_fts, Postgres the generated tsvector
+column posts.search_vector (see app/database.py). Other databases fall
+back to ILIKE matching ordered by date.
+
+Highlighted snippets are safe HTML: the database marks matches with
+private-use sentinel characters, then the text is HTML-escaped and only
+the sentinels become <mark> tags, so markup written in posts is shown
+as text.
+"""
+
+import html
+import re
+from typing import Optional, Tuple
+
+from sqlalchemy import column, false, func, literal_column, or_, table
+from sqlalchemy.orm import Query
+
+from app.config import settings
+from app.database import Post, search_index_ddl
+
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+# Match delimiters used inside the database, replaced after escaping
+MATCH_START = "\ue000"
+MATCH_END = "\ue001"
+
+posts_fts = table("posts_fts", column("rowid"))
+fts_table = literal_column("posts_fts")
+search_vector = literal_column("posts.search_vector")
+
+
+def fts5_query(search: str) -> str:
+    """Quote each term so user input can't inject FTS5 syntax; terms match as prefixes"""
+    terms = re.findall(r"\w+", search)
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def search_posts(query: Query, search: str, highlight: bool = False) -> Tuple[Query, bool]:
+    """Filter a Post query by search terms and order it by relevance.
+
+    When highlight is set, a snippet column is added to each row and the
+    second element of the result is True.
+    """
+    dialect = query.session.get_bind().dialect.name
+
+    if dialect == "sqlite":
+        match = fts5_query(search)
+        if not match:
+            return query.filter(false()), False
+        query = query.join(posts_fts, posts_fts.c.rowid == Post.id).filter(
+            fts_table.op("MATCH")(match)
+        )
+        # Title matches weigh more than content matches
+        query = query.order_by(func.bm25(fts_table, 10.0, 1.0), Post.id.desc())
+        if highlight:
+            snippet = func.snippet(fts_table, -1, MATCH_START, MATCH_END, "…", 24)
+            return query.add_columns(snippet), True
+        return query, False
+
+    if dialect == "postgresql":
+        ts_query = func.websearch_to_tsquery(settings.SEARCH_TS_CONFIG, search)
+        query = query.filter(search_vector.op("@@")(ts_query)).order_by(
+            func.ts_rank(search_vector, ts_query).desc(), Post.id.desc()
+        )
+        if highlight:
+            snippet = func.ts_headline(
+                settings.SEARCH_TS_CONFIG,
+                Post.post_content,
+                ts_query,
+                f'StartSel="{MATCH_START}", StopSel="{MATCH_END}", MaxFragments=1'
+            )
+            return query.add_columns(snippet), True
+        return query, False
+
+    search_term = f"%{search}%"
+    query = query.filter(
+        or_(
+            Post.post_title.ilike(search_term),
+            Post.post_content.ilike(search_term)
+        )
+    ).order_by(Post.created_at.desc(), Post.id.desc())
+    return query, False
+
+
+def snippet_html(snippet: Optional[str]) -> Optional[str]:
+    """Escape a raw database snippet and turn its match delimiters into <mark> tags"""
+    if snippet is None:
+        return None
+    return html.escape(snippet).replace(MATCH_START, HIGHLIGHT_START).replace(MATCH_END, HIGHLIGHT_END)
+
+
+def ensure_search_index(conn) -> None:
+    """Create the full-text index and fill it from posts, in the connection's open transaction"""
+    for statement in search_index_ddl(conn.dialect.name):
+        conn.exec_driver_sql(statement)
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("INSERT INTO posts_fts(posts_fts) VALUES ('rebuild')")
@@ -0,0 +1,156 @@
+"""Tag resolution and post counts.
+
+Tag names of a post are resolved to ids with one IN query; names that do
+not exist yet are created with INSERT ... ON CONFLICT DO NOTHING, so two
+requests introducing the same tag do not race on the unique constraint.
+Ids of existing tags are kept in a per-process name -> id cache.
+
+Tag.posts_count counts published posts and is adjusted in the same
+transaction whenever posts are created, retagged, unpublished or deleted.
+Popular and trending listings are served from a short-lived snapshot.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Set
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.cache import LRUCache
+from app.config import settings
+from app.database import Post, Tag, post_tags
+
+tag_id_cache = LRUCache(maxsize=settings.TAG_CACHE_SIZE, ttl=settings.TAG_CACHE_TTL)
+tag_snapshots = LRUCache(maxsize=64, ttl=settings.TAG_SNAPSHOT_TTL)
+
+
+def normalize_tag_names(names: Iterable[str]) -> List[str]:
+    """Lowercased, stripped, de-duplicated tag names in their original order"""
+    result = []
+    for name in names:
+        name = name.lower().strip()
+        if name and name not in result:
+            result.append(name)
+    return result
+
+
+def _select_ids(db: Session, names: List[str]) -> Dict[str, int]:
+    rows = db.execute(select(Tag.tag_name, Tag.id).where(Tag.tag_name.in_(names)))
+    return dict(rows.all())
+
+
+def _insert_missing(db: Session, names: List[str]) -> None:
+    rows = [{"tag_name": name} for name in names]
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        db.execute(postgresql.insert(Tag).on_conflict_do_nothing(index_elements=["tag_name"]), rows)
+    elif dialect == "sqlite":
+        db.execute(sqlite.insert(Tag).on_conflict_do_nothing(index_elements=["tag_name"]), rows)
+    else:
+        for row in rows:
+            try:
+                with db.begin_nested():
+                    db.execute(insert(Tag), row)
+            except IntegrityError:
+                pass
+
+
+def resolve_tag_ids(db: Session, names: List[str]) -> List[int]:
+    """Ids of the given normalized tag names, creating missing tags"""
+    cached = {name: tag_id_cache.get(name) for name in names}
+    ids = {name: tag_id for name, tag_id in cached.items() if tag_id is not None}
+    missing = [name for name in names if name not in ids]
+    if missing:
+        found = _select_ids(db, missing)
+        # Only tags that already existed are cached: a tag created here
+        # is rolled back with the transaction if the request fails
+        for name, tag_id in found.items():
+            tag_id_cache.set(name, tag_id)
+        ids.update(found)
+        created = [name for name in missing if name not in found]
+        if created:
+            _insert_missing(db, created)
+            ids.update(_select_ids(db, created))
+    return [ids[name] for name in names]
+
+
+def set_post_tags(db: Session, post_id: int, names: Iterable[str], replace: bool = False) -> Set[int]:
+    """Attach tags to a post by name, optionally dropping its current tags first; return their ids"""
+    if replace:
+        db.execute(post_tags.delete().where(post_tags.c.post_id == post_id))
+    tag_ids = resolve_tag_ids(db, normalize_tag_names(names))
+    if tag_ids:
+        db.execute(post_tags.insert(), [{"post_id": post_id, "tag_id": tag_id} for tag_id in tag_ids])
+    return set(tag_ids)
+
+
+def post_tag_ids(db: Session, post_id: int) -> Set[int]:
+    return set(db.execute(select(post_tags.c.tag_id).where(post_tags.c.post_id == post_id)).scalars())
+
+
+def adjust_posts_count(db: Session, before: Set[int], after: Set[int]) -> None:
+    """Move posts_count from the tags a published post had to the ones it has now"""
+    for tag_ids, delta in ((before - after, -1), (after - before, 1)):
+        if tag_ids:
+            db.execute(
+                update(Tag).where(Tag.id.in_(tag_ids)).values(
+                    posts_count=Tag.posts_count + delta
+                ).execution_options(synchronize_session=False)
+            )
+
+
+def remove_user_posts(db: Session, user_id: int) -> None:
+    """Take a user's published posts out of posts_count before the user is deleted"""
+    user_posts = post_tags.join(Post, Post.id == post_tags.c.post_id)
+    condition = (Post.user_id == user_id) & (Post.is_published == True)
+    per_tag = select(func.count()).select_from(user_posts).where(
+        post_tags.c.tag_id == Tag.id,
+        condition
+    ).scalar_subquery()
+    db.execute(
+        update(Tag).where(
+            Tag.id.in_(select(post_tags.c.tag_id).select_from(user_posts).where(condition))
+        ).values(posts_count=Tag.posts_count - per_tag).execution_options(synchronize_session=False)
+    )
+
+
+def tag_listing(db: Session, sort: str, limit: int, days: int) -> List[dict]:
+    """Tags by posts_count ("popular") or by published posts in the last days ("trending")"""
+    key = (sort, limit, days if sort == "trending" else None)
+    snapshot = tag_snapshots.get(key)
+    if snapshot is not None:
+        return snapshot
+
+    if sort == "trending":
+        # Range scan of recent published posts on ix_posts_published_created_id
+        recent = func.count(post_tags.c.post_id).label("recent_posts_count")
+        rows = db.query(Tag, recent).join(
+            post_tags, post_tags.c.tag_id == Tag.id
+        ).join(
+            Post, Post.id == post_tags.c.post_id
+        ).filter(
+            Post.is_published == True,
+            Post.created_at >= datetime.utcnow() - timedelta(days=days)
+        ).group_by(Tag.id).order_by(recent.desc(), Tag.posts_count.desc(), Tag.id).limit(limit).all()
+    else:
+        rows = [
+            (tag, None)
+            for tag in db.query(Tag).filter(Tag.posts_count > 0).order_by(
+                Tag.posts_count.desc(), Tag.id
+            ).limit(limit)
+        ]
+
+    snapshot = [
+        {
+            "id": tag.id,
+            "tag_name": tag.tag_name,
+            "tag_description": tag.tag_description,
+            "posts_count": tag.posts_count,
+            "recent_posts_count": recent_count,
+        }
+        for tag, recent_count in rows
+    ]
+    tag_snapshots.set(key, snapshot)
+    return snapshot
@@ -0,0 +1,160 @@
+"""Per-request timing breakdown.
+
+TimingMiddleware opens a RequestTimings for every HTTP request in a
+context variable. Code on the request path adds to it with timed(...)
+or record(...): SQL statements through engine events (instrument_engine),
+JWT decoding and bcrypt in app.auth, response rendering in
+app.responses. Threadpool endpoints and dependencies see the same
+object, since the threadpool copies the request's context.
+
+When the response starts, the breakdown goes into a Server-Timing header
+(if SERVER_TIMING is set). When it ends, one record goes to the
+app.requests logger with the same numbers as structured fields in
+`extra`, for a JSON formatter to pick up. configure_request_log gives
+that logger a level and, unless the root logger already has handlers,
+a stderr handler of its own.
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+
+logger = logging.getLogger("app.requests")
+
+# Metric names and their Server-Timing descriptions, in header order
+METRICS = {
+    "db": "Database",
+    "jwt": "JWT decode",
+    "bcrypt": "Password hashing",
+    "serialize": "Response rendering",
+}
+
+
+class RequestTimings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        # name -> [count, seconds]
+        self.metrics: Dict[str, List[float]] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        metric = self.metrics.setdefault(name, [0, 0.0])
+        metric[0] += 1
+        metric[1] += seconds
+
+    def count(self, name: str) -> int:
+        return self.metrics.get(name, [0, 0.0])[0]
+
+    def milliseconds(self, name: str) -> float:
+        return round(self.metrics.get(name, [0, 0.0])[1] * 1000, 3)
+
+    def total_milliseconds(self) -> float:
+        return round((time.perf_counter() - self.started) * 1000, 3)
+
+    def server_timing(self) -> str:
+        entries = [
+            f'{name};dur={self.milliseconds(name)};desc="{description}"'
+            for name, description in METRICS.items()
+            if name in self.metrics
+        ]
+        entries.append(f"total;dur={self.total_milliseconds()}")
+        return ", ".join(entries)
+
+    def log_fields(self) -> dict:
+        fields = {"db_queries": self.count("db"), "duration_ms": self.total_milliseconds()}
+        for name in METRICS:
+            fields[f"{name}_ms"] = self.milliseconds(name)
+        return fields
+
+
+def configure_request_log(level: str) -> None:
+    """Emit request records at level, on stderr unless logging is configured elsewhere"""
+    logger.setLevel(level.upper())
+    # uvicorn only configures its own loggers; a configured root logger already gets our records
+    if not logger.handlers and not logging.getLogger().handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        logger.addHandler(handler)
+
+
+current_timings: ContextVar[Optional[RequestTimings]] = ContextVar("current_timings", default=None)
+
+
+def record(name: str, seconds: float) -> None:
+    timings = current_timings.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+@contextmanager
+def timed(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+def instrument_engine(engine) -> None:
+    """Count SQL statements and their execution time towards the current request"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        record("db", time.perf_counter() - conn.info["query_started"].pop())
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        started = context.connection.info.get("query_started") if context.connection is not None else None
+        if started:
+            record("db", time.perf_counter() - started.pop())
+
+
+class TimingMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        status_code = 500
+
+        async def send_with_timings(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if settings.SERVER_TIMING:
+                    MutableHeaders(scope=message).append("Server-Timing", timings.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timings)
+        finally:
+            current_timings.reset(token)
+            logger.info(
+                "%s %s %s %.1fms",
+                scope["method"],
+                scope["path"],
+                status_code,
+                timings.total_milliseconds(),
+                extra={
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status_code,
+                    **timings.log_fields(),
+                },
+            )
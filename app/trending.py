@@ -0,0 +1,120 @@
+"""Time-decayed trending scores of posts.
+
+Every like, comment and view adds its weight to the post's score in the
+post_scores table, and all scores halve every TRENDING_HALF_LIFE_HOURS.
+A background task applies the decay and the events since its previous
+run in one transaction, so the cost of a run depends on recent activity
+rather than on the number of posts, and the trending endpoint is a read
+of the score index. Scores that decay below MIN_SCORE are dropped.
+
+The task is off by default. Enable it with TRENDING_RECOMPUTE_INTERVAL in
+one designated process only: two concurrent runs would count the same
+events twice.
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import bindparam, delete, func, or_, select, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.cache import response_cache
+from app.config import settings
+from app.database import Comment, Post, post_reactions, post_scores
+
+logger = logging.getLogger(__name__)
+
+LIKE_WEIGHT = 3.0
+COMMENT_WEIGHT = 5.0
+VIEW_WEIGHT = 0.1
+MIN_SCORE = 0.01
+
+
+def decay(age: timedelta) -> float:
+    return 0.5 ** (age.total_seconds() / 3600 / settings.TRENDING_HALF_LIFE_HOURS)
+
+
+def recompute_scores(db: Session, now: Optional[datetime] = None) -> int:
+    """Decay stored scores to now and add events since the last run, return number of scored posts"""
+    now = now or datetime.utcnow()
+    last_run = db.execute(select(func.max(post_scores.c.computed_at))).scalar()
+    since = last_run or now - timedelta(hours=settings.TRENDING_BACKFILL_HOURS)
+
+    if last_run:
+        db.execute(update(post_scores).values(
+            score=post_scores.c.score * decay(now - last_run),
+            computed_at=now
+        ))
+
+    gains: Dict[int, float] = defaultdict(float)
+    likes = select(post_reactions.c.post_id, post_reactions.c.reacted_at).where(
+        post_reactions.c.reacted_at > since,
+        post_reactions.c.reacted_at <= now
+    )
+    for post_id, reacted_at in db.execute(likes):
+        gains[post_id] += LIKE_WEIGHT * decay(now - reacted_at)
+    comments = select(Comment.post_id, Comment.created_at).where(
+        Comment.created_at > since,
+        Comment.created_at <= now
+    )
+    for post_id, created_at in db.execute(comments):
+        gains[post_id] += COMMENT_WEIGHT * decay(now - created_at)
+
+    # Views have no timestamps: new views of scored posts and all views of
+    # posts created since the last run count as happening now
+    scored = dict(db.execute(select(post_scores.c.post_id, post_scores.c.views_seen)).all())
+    views = select(Post.id, Post.view_counter).where(
+        or_(Post.created_at > since, Post.id.in_(select(post_scores.c.post_id)))
+    )
+    views_seen = {}
+    for post_id, view_counter in db.execute(views):
+        new_views = (view_counter or 0) - scored.get(post_id, 0)
+        if new_views > 0:
+            gains[post_id] += VIEW_WEIGHT * new_views
+            views_seen[post_id] = view_counter
+
+    existing = [post_id for post_id in gains if post_id in scored]
+    if existing:
+        db.execute(
+            update(post_scores).where(post_scores.c.post_id == bindparam("b_post_id")).values(
+                score=post_scores.c.score + bindparam("b_gain"),
+                views_seen=bindparam("b_views_seen")
+            ),
+            [
+                {"b_post_id": post_id, "b_gain": gains[post_id], "b_views_seen": views_seen.get(post_id, scored[post_id])}
+                for post_id in existing
+            ]
+        )
+    created = [post_id for post_id in gains if post_id not in scored]
+    if created:
+        db.execute(post_scores.insert(), [
+            {"post_id": post_id, "score": gains[post_id], "views_seen": views_seen.get(post_id, 0), "computed_at": now}
+            for post_id in created
+        ])
+
+    db.execute(delete(post_scores).where(
+        or_(post_scores.c.score < MIN_SCORE, post_scores.c.post_id.notin_(select(Post.id)))
+    ))
+    db.commit()
+    response_cache.invalidate("trending")
+    return db.execute(select(func.count()).select_from(post_scores)).scalar()
+
+
+def recompute_with_session(session_factory) -> int:
+    with session_factory() as db:
+        return recompute_scores(db)
+
+
+async def run_recompute(session_factory, interval: float = None) -> None:
+    """Recompute trending scores every interval seconds until cancelled"""
+    interval = interval or settings.TRENDING_RECOMPUTE_INTERVAL
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(recompute_with_session, session_factory)
+        except Exception:
+            logger.exception("Failed to recompute trending scores")
@@ -0,0 +1,138 @@
+"""Write-behind buffer for post view counts.
+
+Views are collected in memory (or Redis when several workers share the
+counts) and written to the database as one batched UPDATE per flush.
+"""
+
+import asyncio
+import logging
+import threading
+from collections import Counter
+from typing import Dict
+
+from sqlalchemy import bindparam
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.cache import response_cache
+from app.config import settings
+from app.database import Post
+
+logger = logging.getLogger(__name__)
+
+posts_table = Post.__table__
+
+
+class MemoryViewBuffer:
+    """Per-process view counts guarded by a lock"""
+
+    def __init__(self):
+        self._counts: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, post_id: int) -> None:
+        with self._lock:
+            self._counts[post_id] += 1
+
+    def pending(self, post_id: int) -> int:
+        with self._lock:
+            return self._counts.get(post_id, 0)
+
+    def drain(self) -> Dict[int, int]:
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        return dict(counts)
+
+    def restore(self, counts: Dict[int, int]) -> None:
+        with self._lock:
+            self._counts.update(counts)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counts.clear()
+
+
+class RedisViewBuffer:
+    """View counts shared by all workers in a Redis hash"""
+
+    key = "blog:post_views:pending"
+
+    def __init__(self, url: str):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+
+    def record(self, post_id: int) -> None:
+        self._redis.hincrby(self.key, post_id, 1)
+
+    def pending(self, post_id: int) -> int:
+        value = self._redis.hget(self.key, post_id)
+        return int(value) if value else 0
+
+    def drain(self) -> Dict[int, int]:
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.hgetall(self.key)
+        pipe.delete(self.key)
+        counts, _ = pipe.execute()
+        return {int(post_id): int(count) for post_id, count in counts.items()}
+
+    def restore(self, counts: Dict[int, int]) -> None:
+        pipe = self._redis.pipeline()
+        for post_id, count in counts.items():
+            pipe.hincrby(self.key, post_id, count)
+        pipe.execute()
+
+    def clear(self) -> None:
+        self._redis.delete(self.key)
+
+
+def create_view_buffer():
+    if settings.VIEW_COUNTER_BACKEND == "redis":
+        return RedisViewBuffer(settings.REDIS_URL)
+    return MemoryViewBuffer()
+
+
+view_buffer = create_view_buffer()
+
+
+def flush_views(db: Session, buffer=None) -> int:
+    """Write buffered views in one batched UPDATE, return number of updated posts"""
+    buffer = buffer or view_buffer
+    counts = buffer.drain()
+    if not counts:
+        return 0
+
+    # modified_at is set explicitly so its onupdate does not mark viewed posts as edited
+    stmt = posts_table.update().where(
+        posts_table.c.id == bindparam("b_post_id")
+    ).values(
+        view_counter=posts_table.c.view_counter + bindparam("b_views"),
+        modified_at=posts_table.c.modified_at
+    )
+    try:
+        db.execute(stmt, [{"b_post_id": post_id, "b_views": views} for post_id, views in counts.items()])
+        db.commit()
+    except Exception:
+        db.rollback()
+        buffer.restore(counts)
+        raise
+    # Cached posts carry the flushed counter, buffered views are added on top when served.
+    # Only single-post entries are dropped; listings keep their counters until the TTL.
+    response_cache.invalidate(*(f"post-views:{post_id}" for post_id in counts))
+    return len(counts)
+
+
+def flush_with_session(session_factory) -> int:
+    with session_factory() as db:
+        return flush_views(db)
+
+
+async def run_flusher(session_factory, interval: float = None) -> None:
+    """Flush buffered views every interval seconds until cancelled"""
+    interval = interval or settings.VIEW_COUNTER_FLUSH_INTERVAL
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(flush_with_session, session_factory)
+        except Exception:
+            logger.exception("Failed to flush post views")
@@ -0,0 +1,389 @@
+"""Latency, queries per request and peak memory of every API route on a seeded database.
+
+Seeds a database of the chosen scale with benchmarks.dataset (or reuses
+one given with --db), calls each route through the ASGI app and writes
+a JSON report with sorted keys, so reports of two commits diff cleanly.
+With --baseline, routes whose p95 latency grew beyond the threshold or
+that run more queries than before are listed and the exit status is 1.
+
+Response caches are cleared before every request unless --warm is given,
+so the numbers reflect the database path.
+
+Usage:
+    python -m benchmarks.bench_endpoints --scale 100k --requests 50 --output bench-100k.json
+    python -m benchmarks.bench_endpoints --scale 100k --db bench-100k.db --baseline bench-100k.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple
+
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.auth import create_access_token, user_cache
+from app.cache import response_cache
+from app.database import Post, Tag, User, bookmarks, post_reactions, user_subscriptions
+from app.db_utils import get_db
+from app.main import app
+from app.tags import tag_snapshots
+from app.view_counter import view_buffer
+
+from benchmarks.dataset import PASSWORD, SCALES, is_seeded, row_counts, seed
+
+
+class Case(NamedTuple):
+    """One benchmarked request; build(ctx, i) returns (url, request kwargs) for the i-th call"""
+    method: str
+    route: str
+    build: Callable
+    variant: str = ""
+
+    @property
+    def name(self) -> str:
+        key = f"{self.method} {self.route}"
+        return f"{key} [{self.variant}]" if self.variant else key
+
+
+def previous(ctx: dict, name: str, i: int) -> dict:
+    """JSON body of the i-th response of an earlier case"""
+    return ctx["responses"][name][i]
+
+
+def auth(ctx: dict, **kwargs) -> dict:
+    return {"headers": ctx["headers"], **kwargs}
+
+
+POSTS = "/api/v1/posts"
+USERS = "/api/v1/users"
+
+# Cases that create rows run before the cases that update or delete them
+CASES = [
+    Case("POST", "/api/v1/auth/register", lambda ctx, i: (
+        "/api/v1/auth/register",
+        {"json": {"email": f"bench{i}@example.com", "username": f"bench{i}", "password": PASSWORD}}
+    )),
+    Case("POST", "/api/v1/auth/login", lambda ctx, i: (
+        "/api/v1/auth/login", {"data": {"username": ctx["viewer_name"], "password": PASSWORD}}
+    )),
+    Case("GET", "/api/v1/auth/me", lambda ctx, i: ("/api/v1/auth/me", auth(ctx))),
+
+    Case("GET", f"{POSTS}", lambda ctx, i: (POSTS, {})),
+    Case("GET", f"{POSTS}", lambda ctx, i: (f"{POSTS}?page=50", {}), "deep page"),
+    Case("GET", f"{POSTS}", lambda ctx, i: (f"{POSTS}?tag={ctx['tag']}", {}), "tag"),
+    Case("GET", f"{POSTS}", lambda ctx, i: (f"{POSTS}?search={ctx['term']}&highlight=true", {}), "search"),
+    Case("GET", f"{POSTS}", lambda ctx, i: (f"{POSTS}?excerpt_length=200&page_size=100", {}), "excerpt"),
+    Case("GET", f"{POSTS}/trending", lambda ctx, i: (f"{POSTS}/trending", {})),
+    Case("POST", f"{POSTS}/batch", lambda ctx, i: (
+        f"{POSTS}/batch", auth(ctx, json={"post_ids": ctx["post_ids"]})
+    )),
+    Case("GET", f"{POSTS}/{{post_id}}", lambda ctx, i: (f"{POSTS}/{ctx['post_ids'][i % len(ctx['post_ids'])]}", {})),
+    Case("POST", f"{POSTS}", lambda ctx, i: (
+        POSTS,
+        auth(ctx, json={
+            "post_title": f"Benchmark post {i}",
+            "post_content": "Benchmark content " * 50,
+            "tag_names": [ctx["tag"], f"bench-tag-{i}"],
+        })
+    )),
+    Case("PUT", f"{POSTS}/{{post_id}}", lambda ctx, i: (
+        f"{POSTS}/{previous(ctx, 'POST /api/v1/posts', i)['id']}",
+        auth(ctx, json={"post_title": f"Edited benchmark post {i}", "tag_names": [ctx["tag"]]})
+    )),
+    Case("POST", f"{POSTS}/{{post_id}}/like", lambda ctx, i: (f"{POSTS}/{ctx['unliked'][i]}/like", auth(ctx))),
+    Case("DELETE", f"{POSTS}/{{post_id}}/like", lambda ctx, i: (f"{POSTS}/{ctx['unliked'][i]}/like", auth(ctx))),
+    Case("POST", f"{POSTS}/{{post_id}}/bookmark", lambda ctx, i: (
+        f"{POSTS}/{ctx['unbookmarked'][i]}/bookmark", auth(ctx)
+    )),
+    Case("DELETE", f"{POSTS}/{{post_id}}/bookmark", lambda ctx, i: (
+        f"{POSTS}/{ctx['unbookmarked'][i]}/bookmark", auth(ctx)
+    )),
+    Case("GET", f"{POSTS}/{{post_id}}/comments", lambda ctx, i: (f"{POSTS}/{ctx['busy_post']}/comments", {})),
+    Case("GET", f"{POSTS}/{{post_id}}/comments/tree", lambda ctx, i: (
+        f"{POSTS}/{ctx['busy_post']}/comments/tree", {}
+    )),
+    Case("POST", f"{POSTS}/{{post_id}}/comments", lambda ctx, i: (
+        f"{POSTS}/{ctx['busy_post']}/comments", auth(ctx, json={"comment_text": f"Benchmark comment {i}"})
+    )),
+    Case("DELETE", f"{POSTS}/{{post_id}}", lambda ctx, i: (
+        f"{POSTS}/{previous(ctx, 'POST /api/v1/posts', i)['id']}", auth(ctx)
+    )),
+
+    Case("GET", "/api/v1/tags", lambda ctx, i: ("/api/v1/tags", {})),
+    Case("GET", "/api/v1/tags", lambda ctx, i: ("/api/v1/tags?sort=trending", {}), "trending"),
+
+    Case("GET", f"{USERS}", lambda ctx, i: (USERS, {})),
+    Case("GET", f"{USERS}/{{user_id}}", lambda ctx, i: (f"{USERS}/{ctx['star']}", {})),
+    Case("GET", f"{USERS}/{{user_id}}/posts", lambda ctx, i: (f"{USERS}/{ctx['star']}/posts", {})),
+    Case("GET", f"{USERS}/me/feed", lambda ctx, i: (f"{USERS}/me/feed", auth(ctx))),
+    Case("GET", f"{USERS}/me/bookmarks", lambda ctx, i: (f"{USERS}/me/bookmarks", auth(ctx))),
+    Case("PUT", f"{USERS}/{{user_id}}", lambda ctx, i: (
+        f"{USERS}/{ctx['viewer']}", auth(ctx, json={"profile_text": f"Benchmark profile {i}"})
+    )),
+    Case("POST", f"{USERS}/{{user_id}}/follow", lambda ctx, i: (f"{USERS}/{ctx['unfollowed'][i]}/follow", auth(ctx))),
+    Case("DELETE", f"{USERS}/{{user_id}}/follow", lambda ctx, i: (
+        f"{USERS}/{ctx['unfollowed'][i]}/follow", auth(ctx)
+    )),
+    Case("DELETE", f"{USERS}/{{user_id}}", lambda ctx, i: (
+        f"{USERS}/{previous(ctx, 'POST /api/v1/auth/register', i)['id']}",
+        {"headers": {"Authorization": "Bearer " + create_access_token(
+            {"sub": str(previous(ctx, 'POST /api/v1/auth/register', i)['id'])}
+        )}}
+    )),
+
+    Case("GET", "/api/v1/metrics/cache", lambda ctx, i: ("/api/v1/metrics/cache", {})),
+    Case("GET", "/api/v1/metrics/db-pool", lambda ctx, i: ("/api/v1/metrics/db-pool", {})),
+]
+
+
+def make_context(engine, calls: int) -> dict:
+    """Ids the cases work on: an active viewer, popular rows and rows the viewer hasn't touched yet"""
+    with engine.connect() as conn:
+        viewer = conn.execute(
+            select(user_subscriptions.c.follower_id).group_by(user_subscriptions.c.follower_id).order_by(
+                func.count().desc()
+            ).limit(1)
+        ).scalar()
+        star = conn.execute(
+            select(user_subscriptions.c.following_id).group_by(user_subscriptions.c.following_id).order_by(
+                func.count().desc()
+            ).limit(1)
+        ).scalar()
+        busy_post = conn.execute(select(Post.id).order_by(Post.comments_count.desc()).limit(1)).scalar()
+        popular = conn.execute(
+            select(Post.id).where(Post.is_published == True).order_by(Post.likes_count.desc()).limit(50)
+        ).scalars().all()
+        title = conn.execute(select(Post.post_title).where(Post.id == popular[0])).scalar()
+        context = {
+            "viewer": viewer,
+            "viewer_name": conn.execute(select(User.username).where(User.id == viewer)).scalar(),
+            "star": star,
+            "busy_post": busy_post,
+            "post_ids": popular,
+            "tag": conn.execute(select(Tag.tag_name).order_by(Tag.posts_count.desc()).limit(1)).scalar(),
+            "term": title.split()[0],
+            "unliked": conn.execute(
+                select(Post.id).where(
+                    Post.is_published == True,
+                    Post.id.not_in(select(post_reactions.c.post_id).where(post_reactions.c.user_id == viewer))
+                ).limit(calls)
+            ).scalars().all(),
+            "unbookmarked": conn.execute(
+                select(Post.id).where(
+                    Post.is_published == True,
+                    Post.id.not_in(select(bookmarks.c.post_id).where(bookmarks.c.user_id == viewer))
+                ).limit(calls)
+            ).scalars().all(),
+            "unfollowed": conn.execute(
+                select(User.id).where(
+                    User.id != viewer,
+                    User.id.not_in(
+                        select(user_subscriptions.c.following_id).where(user_subscriptions.c.follower_id == viewer)
+                    )
+                ).limit(calls)
+            ).scalars().all(),
+        }
+    context["headers"] = {"Authorization": "Bearer " + create_access_token({"sub": str(viewer)})}
+    context["responses"] = {}
+    return context
+
+
+@contextmanager
+def query_counter(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def percentile(ordered: List[float], share: float) -> float:
+    return ordered[min(len(ordered) - 1, int(round(share * (len(ordered) - 1))))]
+
+
+def run_case(client: TestClient, engine, case: Case, ctx: dict, requests: int, warm: bool) -> dict:
+    timings = []
+    queries = []
+    statuses = {}
+    bodies = ctx["responses"].setdefault(case.name, [])
+    peak = 0
+    # The last call runs under tracemalloc, which slows it down too much to be timed
+    for i in range(requests + 1):
+        if not warm:
+            response_cache.clear()
+            tag_snapshots.clear()
+        url, kwargs = case.build(ctx, i)
+        measure_memory = i == requests
+        with query_counter(engine) as statements:
+            if measure_memory:
+                tracemalloc.start()
+            started = time.perf_counter()
+            response = client.request(case.method, url, **kwargs)
+            elapsed = (time.perf_counter() - started) * 1000
+            if measure_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+        statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+        is_json = response.headers.get("content-type", "").startswith("application/json")
+        bodies.append(response.json() if is_json and response.content else None)
+        if not measure_memory:
+            timings.append(elapsed)
+            queries.append(len(statements))
+    view_buffer.clear()
+    timings.sort()
+    return {
+        "p50_ms": round(percentile(timings, 0.50), 3),
+        "p95_ms": round(percentile(timings, 0.95), 3),
+        "p99_ms": round(percentile(timings, 0.99), 3),
+        "queries": statistics.median(queries),
+        "peak_kib": round(peak / 1024, 1),
+        "status": statuses,
+    }
+
+
+def api_routes() -> set:
+    """Method and path of every route defined in app/routers"""
+    return {
+        f"{method} {route.path}"
+        for route in app.routes
+        if isinstance(route, APIRoute) and route.endpoint.__module__.startswith("app.routers")
+        for method in route.methods
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> List[str]:
+    """Routes whose p95 latency grew by more than threshold or that run more queries"""
+    regressions = []
+    for name, result in sorted(report["routes"].items()):
+        before = baseline["routes"].get(name)
+        if before is None:
+            continue
+        if result["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {before['p95_ms']}ms -> {result['p95_ms']}ms")
+        if result["queries"] > before["queries"]:
+            regressions.append(f"{name}: queries {before['queries']} -> {result['queries']}")
+    return regressions
+
+
+def benchmark(engine, requests: int, warm: bool) -> Dict[str, dict]:
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def bench_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = bench_db
+    user_cache.clear()
+    ctx = make_context(engine, requests + 1)
+    # Without a `with` block the lifespan tasks (view flusher, trending recompute) don't run
+    client = TestClient(app)
+    results = {}
+    try:
+        for case in CASES:
+            results[case.name] = run_case(client, engine, case, ctx, requests, warm)
+            result = results[case.name]
+            print(
+                f"  {case.name:52} p50={result['p50_ms']:>8}ms p95={result['p95_ms']:>8}ms "
+                f"p99={result['p99_ms']:>8}ms queries={result['queries']:>5} peak={result['peak_kib']}KiB"
+            )
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="1k", help="Number of posts to seed")
+    parser.add_argument("--db", help="SQLite file to seed, or to reuse if it is already seeded")
+    parser.add_argument("--requests", type=int, default=50, help="Timed requests per route")
+    parser.add_argument("--warm", action="store_true", help="Keep response caches between requests")
+    parser.add_argument("--output", default=None, help="Report path, bench-endpoints-<scale>.json by default")
+    parser.add_argument("--baseline", help="Earlier report to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed p95 growth against the baseline")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.db or os.path.join(tmp, "bench.db")
+        engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+        if is_seeded(engine):
+            print(f"Reusing {path}")
+        else:
+            print(f"Seeding {SCALES[args.scale]} posts into {path}...")
+            started = time.perf_counter()
+            seed(engine, SCALES[args.scale])
+            print(f"  done in {time.perf_counter() - started:.0f}s")
+        dataset = row_counts(engine)
+
+        print(f"{args.requests} requests per route ({'warm' if args.warm else 'cold'} caches)")
+        routes = benchmark(engine, args.requests, args.warm)
+        engine.dispose()
+
+    missing = sorted(api_routes() - {f"{case.method} {case.route}" for case in CASES})
+    for route in missing:
+        print(f"  not benchmarked: {route}")
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "scale": args.scale,
+            "requests": args.requests,
+            "warm_cache": args.warm,
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "generated_at": datetime.utcnow().isoformat(timespec="seconds"),
+        },
+        "dataset": dataset,
+        "routes": routes,
+        "missing_routes": missing,
+    }
+    output = args.output or f"bench-endpoints-{args.scale}.json"
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2, sort_keys=True)
+        file.write("\n")
+    print(f"Report written to {output}")
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.threshold)
+        for line in regressions:
+            print(f"  regression: {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
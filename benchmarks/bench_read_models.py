@@ -0,0 +1,121 @@
+"""Compare building a page of posts: ORM hydration + from_orm vs projected rows, with and without excerpts.
+
+Reports latency and peak Python allocation (tracemalloc) per request.
+
+Usage:
+    python -m benchmarks.bench_read_models --posts 20000 --page-size 100 --repeat 50
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from app.database import Base, Post, Tag, User, post_tags
+from app.read_models import post_list_query, serialize_posts
+from app.responses import FastJSONResponse
+from app.schemas import PostResponse
+
+from benchmarks.bench_search import make_vocabulary, random_text, zipf_weights
+
+
+def seed(engine, posts: int, words: int, chunk: int = 5000) -> None:
+    rng = random.Random(42)
+    vocabulary = make_vocabulary(rng)
+    weights = zipf_weights(len(vocabulary))
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__), [
+            {"email": f"bench{i}@example.com", "username": f"bench{i}", "password_hash": "-"}
+            for i in range(1, 101)
+        ])
+        conn.execute(insert(Tag.__table__), [{"tag_name": f"tag{i}"} for i in range(1, 51)])
+        for start in range(0, posts, chunk):
+            count = min(chunk, posts - start)
+            conn.execute(insert(Post.__table__), [
+                {
+                    "user_id": rng.randint(1, 100),
+                    "post_title": random_text(rng, vocabulary, weights, 6),
+                    "post_content": random_text(rng, vocabulary, weights, words),
+                    "is_published": True,
+                }
+                for _ in range(count)
+            ])
+            conn.execute(insert(post_tags), [
+                {"post_id": post_id, "tag_id": tag_id}
+                for post_id in range(start + 1, start + count + 1)
+                for tag_id in rng.sample(range(1, 51), 3)
+            ])
+
+
+def orm_page(db: Session, page_size: int, excerpt_length=None) -> bytes:
+    posts = db.query(Post).filter(Post.is_published == True).options(
+        joinedload(Post.author), selectinload(Post.tags)
+    ).order_by(Post.created_at.desc(), Post.id.desc()).limit(page_size).all()
+    return FastJSONResponse([PostResponse.from_orm(post) for post in posts]).body
+
+
+def projected_page(db: Session, page_size: int, excerpt_length=None) -> bytes:
+    rows = post_list_query(db, excerpt_length).filter(Post.is_published == True).order_by(
+        Post.created_at.desc(), Post.id.desc()
+    ).limit(page_size).all()
+    return FastJSONResponse(serialize_posts(db, rows)).body
+
+
+def measure(engine, build, page_size: int, repeat: int, excerpt_length=None) -> dict:
+    timings = []
+    peaks = []
+    for _ in range(repeat):
+        # A fresh session per request, like the endpoints get
+        with Session(engine) as db:
+            tracemalloc.start()
+            started = time.perf_counter()
+            body = build(db, page_size, excerpt_length)
+            timings.append((time.perf_counter() - started) * 1000)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+    timings.sort()
+    return {
+        "p50_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 2),
+        "peak_kib": round(statistics.median(peaks) / 1024),
+        "body_kib": round(len(body) / 1024),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=20_000)
+    parser.add_argument("--words", type=int, default=300, help="Words of content per post")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--excerpt", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        print(f"Seeding {args.posts} posts...")
+        seed(engine, args.posts, args.words)
+        cases = (
+            ("ORM + from_orm", orm_page, None),
+            ("projection", projected_page, None),
+            (f"projection, excerpt {args.excerpt}", projected_page, args.excerpt),
+        )
+        print(f"Page of {args.page_size} posts")
+        for name, build, excerpt_length in cases:
+            result = measure(engine, build, args.page_size, args.repeat, excerpt_length)
+            print(
+                f"  {name:24} p50={result['p50_ms']}ms p95={result['p95_ms']}ms "
+                f"peak={result['peak_kib']}KiB body={result['body_kib']}KiB"
+            )
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Compare response encoding of a page of posts: validate + stdlib json vs orjson, and compression.
+
+Usage:
+    python -m benchmarks.bench_responses --posts 100 --repeat 200
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from pydantic import TypeAdapter
+
+from app.compression import BrotliCompressor, GzipCompressor, brotli
+from app.config import settings
+from app.responses import FastJSONResponse
+from app.schemas import PostResponse
+
+from benchmarks.bench_search import make_vocabulary, random_text, zipf_weights
+
+
+def make_page(posts: int, words: int) -> List[PostResponse]:
+    rng = random.Random(42)
+    vocabulary = make_vocabulary(rng)
+    weights = zipf_weights(len(vocabulary))
+    now = datetime.utcnow()
+    author = {
+        "id": 1,
+        "email": "bench@example.com",
+        "username": "bench",
+        "is_active": True,
+        "created_at": now,
+    }
+    return [
+        PostResponse(
+            id=post_id,
+            user_id=1,
+            post_title=random_text(rng, vocabulary, weights, 6),
+            post_content=random_text(rng, vocabulary, weights, words),
+            is_published=True,
+            created_at=now - timedelta(minutes=post_id),
+            modified_at=now,
+            view_counter=rng.randint(0, 5000),
+            author=author,
+            tags=[{"id": tag_id, "tag_name": f"tag{tag_id}"} for tag_id in range(3)],
+            likes_count=rng.randint(0, 300),
+            comments_count=rng.randint(0, 50),
+        )
+        for post_id in range(1, posts + 1)
+    ]
+
+
+def validated_stdlib(page: List[PostResponse], adapter: TypeAdapter) -> bytes:
+    """What a response_model endpoint does: dump, validate again, dump to JSON types, json.dumps"""
+    content = adapter.dump_python(adapter.validate_python([post.model_dump() for post in page]), mode="json")
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def fast_path(page: List[PostResponse], adapter: TypeAdapter) -> bytes:
+    return FastJSONResponse(page).body
+
+
+def timed(function, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "p50_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=100)
+    parser.add_argument("--words", type=int, default=300, help="Words of content per post")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    page = make_page(args.posts, args.words)
+    adapter = TypeAdapter(List[PostResponse])
+
+    print(f"Serializing a page of {args.posts} posts")
+    for name, encode in (("validate + json", validated_stdlib), ("orjson", fast_path)):
+        result = timed(lambda: encode(page, adapter), args.repeat)
+        print(f"  {name:16} p50={result['p50_ms']}ms p95={result['p95_ms']}ms")
+
+    body = fast_path(page, adapter)
+    codecs = [("identity", None), ("gzip", lambda: GzipCompressor(settings.COMPRESSION_GZIP_LEVEL))]
+    if brotli is not None:
+        codecs.append(("br", lambda: BrotliCompressor(settings.COMPRESSION_BROTLI_QUALITY)))
+
+    print("Bytes on the wire")
+    for name, make_compressor in codecs:
+        if make_compressor is None:
+            print(f"  {name:8} {len(body):>9} B")
+            continue
+
+        def compress():
+            compressor = make_compressor()
+            return compressor.compress(body) + compressor.finish()
+
+        size = len(compress())
+        result = timed(compress, args.repeat)
+        print(f"  {name:8} {size:>9} B ({size / len(body):.1%}) p50={result['p50_ms']}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Compare post search latency: full-text index vs ILIKE '%term%'.
+
+Usage:
+    python -m benchmarks.bench_search --posts 100000 --repeat 20
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert, or_
+from sqlalchemy.orm import Session
+
+from app.database import Base, Post, User
+from app.search import search_posts
+
+VOCABULARY_SIZE = 20_000
+SYLLABLES = "ба ве ги до ку ла ми но пе ре са ти фу ха че шу мо ри".split()
+
+
+def make_vocabulary(rng: random.Random) -> list:
+    words = set()
+    while len(words) < VOCABULARY_SIZE:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 5))))
+    return sorted(words)
+
+
+def zipf_weights(size: int) -> list:
+    return [1 / rank for rank in range(1, size + 1)]
+
+
+def random_text(rng: random.Random, vocabulary: list, weights: list, words: int) -> str:
+    return " ".join(rng.choices(vocabulary, weights, k=words))
+
+
+def seed(engine, posts: int, chunk: int = 5000) -> list:
+    """Insert posts with Zipf-distributed words, return query terms of falling frequency"""
+    rng = random.Random(42)
+    vocabulary = make_vocabulary(rng)
+    weights = zipf_weights(len(vocabulary))
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__), [{"email": "bench@example.com", "username": "bench", "password_hash": "-"}])
+        for start in range(0, posts, chunk):
+            conn.execute(insert(Post.__table__), [
+                {
+                    "user_id": 1,
+                    "post_title": random_text(rng, vocabulary, weights, 6),
+                    "post_content": random_text(rng, vocabulary, weights, 200),
+                    "is_published": True,
+                }
+                for _ in range(min(chunk, posts - start))
+            ])
+    # Common, mid-frequency and rare terms
+    return [vocabulary[rank] for rank in (10, 300, 3000, 15000)]
+
+
+def ilike_query(db: Session, term: str):
+    pattern = f"%{term}%"
+    return db.query(Post.id).filter(
+        Post.is_published == True,
+        or_(Post.post_title.ilike(pattern), Post.post_content.ilike(pattern))
+    ).order_by(Post.created_at.desc())
+
+
+def fts_query(db: Session, term: str):
+    query, _ = search_posts(db.query(Post.id).filter(Post.is_published == True), term)
+    return query
+
+
+def measure(engine, build, terms: list, repeat: int, page_size: int) -> dict:
+    timings = []
+    with Session(engine) as db:
+        for _ in range(repeat):
+            for term in terms:
+                started = time.perf_counter()
+                build(db, term).limit(page_size).all()
+                timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "p50_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--page-size", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        print(f"Seeding {args.posts} posts...")
+        terms = seed(engine, args.posts)
+        for term in terms:
+            print(f"Term {term!r}")
+            for name, build in (("ILIKE", ilike_query), ("FTS5", fts_query)):
+                result = measure(engine, build, [term], args.repeat, args.page_size)
+                print(f"  {name:6} p50={result['p50_ms']}ms p95={result['p95_ms']}ms")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
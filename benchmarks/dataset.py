@@ -0,0 +1,303 @@
+"""Synthetic blog data with power-law activity, for benchmarks.
+
+A few users write most of the posts and gather most of the followers,
+a few posts collect most of the likes, comments and bookmarks, and a few
+tags cover most posts, roughly like a real community. Rows go in through
+chunked Core executemany inserts with explicit ids, so the database must
+be empty; on PostgreSQL they are streamed with COPY instead, and on
+SQLite the full-text index is rebuilt once after the load. Denormalized
+counters, the feed inboxes and trending scores are derived afterwards
+with the app's own maintenance code.
+
+Every user's password is PASSWORD, hashed once.
+"""
+
+import io
+import itertools
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, insert, inspect, select, update
+from sqlalchemy.orm import Session
+
+from app.auth import get_password_hash
+from app.config import settings
+from app.database import (
+    Base, Comment, Post, Tag, User, bookmarks, feed_entries, post_reactions, post_tags, user_subscriptions
+)
+from app.search import ensure_search_index
+from app.trending import recompute_scores
+from reconcile_counters import reconcile_counters, reconcile_tag_counts
+
+from benchmarks.bench_search import make_vocabulary, zipf_weights
+
+SCALES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+PASSWORD = "password123"
+HISTORY_DAYS = 365
+# Pareto shapes of per-post and per-user activity counts, smaller is heavier-tailed
+LIKES_SHAPE = 1.16
+COMMENTS_SHAPE = 1.5
+BOOKMARKS_SHAPE = 2.0
+FOLLOWS_SHAPE = 1.2
+REPLY_SHARE = 0.3
+
+
+class PowerLaw:
+    """Draws ids 1..size with Zipf probabilities; which ids are popular is shuffled"""
+
+    def __init__(self, rng: random.Random, size: int):
+        self.rng = rng
+        self.ids = list(range(1, size + 1))
+        rng.shuffle(self.ids)
+        self.cum_weights = list(itertools.accumulate(zipf_weights(size)))
+
+    def draw(self, k: int = 1) -> List[int]:
+        return self.rng.choices(self.ids, cum_weights=self.cum_weights, k=k)
+
+    def draw_distinct(self, k: int, exclude: int = 0) -> set:
+        picked = set()
+        # Heavy heads make repeats likely; a bounded number of rounds keeps this cheap
+        for _ in range(4):
+            picked.update(self.draw(k - len(picked)))
+            picked.discard(exclude)
+            if len(picked) >= k:
+                break
+        return picked
+
+
+class TextMaker:
+    """Random text with Zipf word frequencies"""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.vocabulary = make_vocabulary(rng)
+        self.cum_weights = list(itertools.accumulate(zipf_weights(len(self.vocabulary))))
+
+    def __call__(self, words: int) -> str:
+        return " ".join(self.rng.choices(self.vocabulary, cum_weights=self.cum_weights, k=words))
+
+
+def pareto_count(rng: random.Random, shape: float, cap: int) -> int:
+    return min(cap, int(rng.paretovariate(shape)) - 1)
+
+
+def between(rng: random.Random, start: datetime, end: datetime) -> datetime:
+    return start + (end - start) * rng.random()
+
+
+def dataset_sizes(posts: int) -> Dict[str, int]:
+    return {"users": max(50, posts // 10), "tags": min(500, max(20, posts // 200)), "posts": posts}
+
+
+def generate(
+    posts: int,
+    seed: int = 42,
+    now: datetime = None,
+    chunk: int = 5000,
+    users: Optional[int] = None,
+    tags: Optional[int] = None
+):
+    """Yield (table, rows) batches of a dataset with the given number of posts.
+
+    Users and tags default to numbers proportional to posts.
+    """
+    rng = random.Random(seed)
+    now = now or datetime.utcnow()
+    sizes = dataset_sizes(posts)
+    users = users or sizes["users"]
+    tags = tags or sizes["tags"]
+    random_text = TextMaker(rng)
+    password_hash = get_password_hash(PASSWORD)
+    start = now - timedelta(days=HISTORY_DAYS)
+
+    for first in range(1, users + 1, chunk):
+        yield User.__table__, [
+            {
+                "id": user_id,
+                "email": f"user{user_id}@example.com",
+                "username": f"user{user_id}",
+                "password_hash": password_hash,
+                "created_at": between(rng, start - timedelta(days=HISTORY_DAYS), start),
+                "is_active": True,
+                "profile_text": random_text(rng.randint(0, 30)),
+            }
+            for user_id in range(first, min(first + chunk, users + 1))
+        ]
+
+    yield Tag.__table__, [
+        {"id": tag_id, "tag_name": f"tag{tag_id}", "tag_description": random_text(5)}
+        for tag_id in range(1, tags + 1)
+    ]
+
+    followees = PowerLaw(rng, users)
+    for first in range(1, users + 1, chunk):
+        rows = []
+        for user_id in range(first, min(first + chunk, users + 1)):
+            for following_id in followees.draw_distinct(pareto_count(rng, FOLLOWS_SHAPE, 1000), user_id):
+                # Follows happened over the last two months, fan-out only covers posts after them
+                rows.append({
+                    "follower_id": user_id,
+                    "following_id": following_id,
+                    "subscribed_at": between(rng, now - timedelta(days=60), now),
+                })
+        yield user_subscriptions, rows
+
+    authors = PowerLaw(rng, users)
+    tag_picker = PowerLaw(rng, tags)
+    comment_ids = itertools.count(1)
+    for first in range(1, posts + 1, chunk):
+        batch = {Post.__table__: [], post_tags: [], post_reactions: [], Comment.__table__: [], bookmarks: []}
+        for post_id in range(first, min(first + chunk, posts + 1)):
+            created_at = between(rng, start, now)
+            batch[Post.__table__].append({
+                "id": post_id,
+                "user_id": authors.draw()[0],
+                "post_title": random_text(rng.randint(3, 10)),
+                "post_content": random_text(rng.randint(40, 250)),
+                "created_at": created_at,
+                "modified_at": created_at,
+                "is_published": rng.random() < 0.95,
+                "view_counter": pareto_count(rng, 1.1, 1_000_000),
+            })
+            batch[post_tags].extend(
+                {"post_id": post_id, "tag_id": tag_id, "added_at": created_at}
+                for tag_id in tag_picker.draw_distinct(rng.randint(0, 4))
+            )
+            batch[post_reactions].extend(
+                {"user_id": user_id, "post_id": post_id, "reacted_at": between(rng, created_at, now)}
+                for user_id in rng.sample(range(1, users + 1), pareto_count(rng, LIKES_SHAPE, users))
+            )
+            batch[bookmarks].extend(
+                {"user_id": user_id, "post_id": post_id, "saved_at": between(rng, created_at, now)}
+                for user_id in rng.sample(range(1, users + 1), pareto_count(rng, BOOKMARKS_SHAPE, users))
+            )
+            thread = []
+            comment_time = created_at
+            for _ in range(pareto_count(rng, COMMENTS_SHAPE, 2000)):
+                comment_id = next(comment_ids)
+                comment_time = between(rng, comment_time, now)
+                batch[Comment.__table__].append({
+                    "id": comment_id,
+                    "post_id": post_id,
+                    "user_id": rng.randint(1, users),
+                    "parent_comment_id": rng.choice(thread) if thread and rng.random() < REPLY_SHARE else None,
+                    "comment_text": random_text(rng.randint(3, 40)),
+                    "created_at": comment_time,
+                    "updated_at": comment_time,
+                    "was_edited": False,
+                })
+                thread.append(comment_id)
+        yield from batch.items()
+
+
+def derive(bind, now: datetime = None) -> None:
+    """Fill counters, high fan-out flags, feed inboxes and trending scores from the raw rows"""
+    reconcile_counters(bind)
+    reconcile_tag_counts(bind)
+    followers = select(func.count()).where(user_subscriptions.c.following_id == User.id).scalar_subquery()
+    with Session(bind) as db:
+        db.execute(update(User).where(followers > settings.FEED_FANOUT_LIMIT).values(is_high_fanout=True))
+        db.execute(feed_entries.insert().from_select(
+            ["user_id", "post_id", "created_at"],
+            select(user_subscriptions.c.follower_id, Post.id, Post.created_at).join(
+                Post, Post.user_id == user_subscriptions.c.following_id
+            ).join(User, User.id == Post.user_id).where(
+                Post.is_published == True,
+                User.is_high_fanout == False,
+                Post.created_at >= user_subscriptions.c.subscribed_at
+            )
+        ))
+        db.commit()
+        recompute_scores(db, now)
+
+
+def copy_value(value) -> str:
+    """A value in PostgreSQL COPY text format"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, str):
+        return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+    return str(value)
+
+
+def copy_rows(conn, table, rows: List[dict]) -> None:
+    """Stream rows into a PostgreSQL table with COPY ... FROM STDIN"""
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(copy_value(row[column]) for column in columns))
+        buffer.write("\n")
+    buffer.seek(0)
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN", buffer)
+    finally:
+        cursor.close()
+
+
+def reset_sequences(conn) -> None:
+    """Move PostgreSQL id sequences past the explicitly inserted ids"""
+    for table in (User.__table__, Tag.__table__, Post.__table__, Comment.__table__):
+        conn.exec_driver_sql(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+            f"coalesce((SELECT max(id) FROM {table.name}), 0) + 1, false)"
+        )
+
+
+def load(engine, batches: Iterable[Tuple]) -> Dict[str, List[float]]:
+    """Insert generated batches in one transaction, return [rows, seconds] per table.
+
+    Seconds cover the database writes only, not generating the rows.
+    """
+    stats = {}
+    with engine.begin() as conn:
+        use_copy = conn.dialect.name == "postgresql"
+        if conn.dialect.name == "sqlite":
+            # Indexing posts one trigger call at a time is the slowest part of the load
+            conn.exec_driver_sql("DROP TRIGGER IF EXISTS posts_fts_ai")
+        for table, rows in batches:
+            if not rows:
+                continue
+            started = time.perf_counter()
+            if use_copy:
+                copy_rows(conn, table, rows)
+            else:
+                conn.execute(insert(table), rows)
+            table_stats = stats.setdefault(table.name, [0, 0.0])
+            table_stats[0] += len(rows)
+            table_stats[1] += time.perf_counter() - started
+        if use_copy:
+            reset_sequences(conn)
+        if conn.dialect.name == "sqlite":
+            ensure_search_index(conn)
+    return stats
+
+
+def seed(engine, posts: int, seed: int = 42) -> Dict[str, int]:
+    """Create the schema and fill it, return row counts per table"""
+    now = datetime.utcnow()
+    Base.metadata.create_all(bind=engine)
+    load(engine, generate(posts, seed, now))
+    derive(engine, now)
+    return row_counts(engine)
+
+
+def row_counts(engine) -> Dict[str, int]:
+    with engine.connect() as conn:
+        return {
+            table.name: conn.execute(select(func.count()).select_from(table)).scalar()
+            for table in Base.metadata.sorted_tables
+        }
+
+
+def is_seeded(engine) -> bool:
+    if not inspect(engine).has_table("posts"):
+        return False
+    with engine.connect() as conn:
+        return conn.execute(select(Post.id).limit(1)).first() is not None
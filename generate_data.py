@@ -0,0 +1,58 @@
+"""Fill the database with a large synthetic dataset for load testing.
+
+Users, posts, tags, comments, likes, bookmarks and follows follow
+power-law distributions (see benchmarks/dataset.py). Rows are written in
+chunks with Core executemany, or COPY on PostgreSQL, and every user gets
+the same precomputed password hash. The database must hold no posts yet.
+
+Usage:
+    python generate_data.py --users 1000000 --posts 3000000
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime
+
+from app.db_utils import engine
+from benchmarks.dataset import PASSWORD, dataset_sizes, derive, generate, is_seeded, load, row_counts
+from init_db import init_db
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=None, help="Defaults to a tenth of the posts")
+    parser.add_argument("--tags", type=int, default=None, help="Defaults to one per 200 posts, at most 500")
+    parser.add_argument("--chunk", type=int, default=5000, help="Rows per insert batch")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    init_db()
+    if is_seeded(engine):
+        print("Database already has posts, generate into an empty one")
+        sys.exit(1)
+
+    sizes = dataset_sizes(args.posts)
+    users = args.users or sizes["users"]
+    tags = args.tags or sizes["tags"]
+    print(f"Generating {users} users, {tags} tags and {args.posts} posts ({engine.dialect.name})...")
+    now = datetime.utcnow()
+    started = time.perf_counter()
+    stats = load(engine, generate(args.posts, args.seed, now, args.chunk, users, tags))
+    generated = time.perf_counter() - started
+    for table, (rows, seconds) in sorted(stats.items()):
+        print(f"  {table:20} {rows:>10} rows  {rows / max(seconds, 1e-9):>10.0f} rows/s written")
+    total = sum(rows for rows, _ in stats.values())
+    print(f"✓ Inserted {total} rows in {generated:.1f}s ({total / generated:.0f} rows/s including generation)")
+
+    started = time.perf_counter()
+    derive(engine, now)
+    print(f"✓ Derived counters, feeds and trending scores in {time.perf_counter() - started:.1f}s")
+    for table, count in row_counts(engine).items():
+        print(f"  {table:20} {count:>10}")
+    print(f"\nEvery user logs in as user<N> / {PASSWORD}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,19 @@
 """Initialize database with tables and sample data"""
 
-from app.database import Base, User, Post, Tag, Comment
+from alembic import command
+from alembic.config import Config
+
+from app.database import User, Post, Tag, Comment
 from app.db_utils import engine
 from app.auth import get_password_hash
 from sqlalchemy.orm import Session
 
 
 def init_db():
-    """Create all tables"""
-    print("Creating database tables...")
-    Base.metadata.create_all(bind=engine)
-    print("✓ Tables created successfully")
+    """Create or upgrade tables, indexes and the search index through migrations"""
+    print("Applying migrations...")
+    command.upgrade(Config("alembic.ini"), "head")
+    print("✓ Database schema is up to date")
 
 
 def create_sample_data():
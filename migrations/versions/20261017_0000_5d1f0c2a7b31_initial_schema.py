@@ -0,0 +1,147 @@
+"""initial schema
+
+Tables as Base.metadata.create_all built them before migrations existed.
+Databases created that way can be stamped with this revision and upgraded.
+
+Revision ID: 5d1f0c2a7b31
+Revises:
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d1f0c2a7b31'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('email', sa.String(length=255), nullable=False),
+        sa.Column('username', sa.String(length=50), nullable=False),
+        sa.Column('password_hash', sa.String(length=255), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('last_login', sa.DateTime(), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('profile_text', sa.Text(), nullable=True),
+        sa.Column('avatar_path', sa.String(length=500), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_users_id', 'users', ['id'])
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+    op.create_index('ix_users_username', 'users', ['username'], unique=True)
+
+    op.create_table(
+        'tags',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tag_name', sa.String(length=50), nullable=False),
+        sa.Column('tag_description', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_tags_id', 'tags', ['id'])
+    op.create_index('ix_tags_tag_name', 'tags', ['tag_name'], unique=True)
+
+    op.create_table(
+        'posts',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('post_title', sa.String(length=300), nullable=False),
+        sa.Column('post_content', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('modified_at', sa.DateTime(), nullable=True),
+        sa.Column('is_published', sa.Boolean(), nullable=True),
+        sa.Column('view_counter', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_posts_id', 'posts', ['id'])
+    op.create_index('ix_posts_created_at', 'posts', ['created_at'])
+
+    op.create_table(
+        'comments',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('parent_comment_id', sa.Integer(), nullable=True),
+        sa.Column('comment_text', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('was_edited', sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(['parent_comment_id'], ['comments.id']),
+        sa.ForeignKeyConstraint(['post_id'], ['posts.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_comments_id', 'comments', ['id'])
+    op.create_index('ix_comments_post_id', 'comments', ['post_id'])
+    op.create_index('ix_comments_user_id', 'comments', ['user_id'])
+
+    op.create_table(
+        'post_tags',
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('tag_id', sa.Integer(), nullable=False),
+        sa.Column('added_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['post_id'], ['posts.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['tag_id'], ['tags.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('post_id', 'tag_id')
+    )
+
+    op.create_table(
+        'bookmarks',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('saved_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['post_id'], ['posts.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'post_id')
+    )
+
+    op.create_table(
+        'user_subscriptions',
+        sa.Column('follower_id', sa.Integer(), nullable=False),
+        sa.Column('following_id', sa.Integer(), nullable=False),
+        sa.Column('subscribed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['follower_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['following_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('follower_id', 'following_id')
+    )
+
+    op.create_table(
+        'post_reactions',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('reacted_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['post_id'], ['posts.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'post_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('post_reactions')
+    op.drop_table('user_subscriptions')
+    op.drop_table('bookmarks')
+    op.drop_table('post_tags')
+    op.drop_index('ix_comments_user_id', table_name='comments')
+    op.drop_index('ix_comments_post_id', table_name='comments')
+    op.drop_index('ix_comments_id', table_name='comments')
+    op.drop_table('comments')
+    op.drop_index('ix_posts_created_at', table_name='posts')
+    op.drop_index('ix_posts_id', table_name='posts')
+    op.drop_table('posts')
+    op.drop_index('ix_tags_tag_name', table_name='tags')
+    op.drop_index('ix_tags_id', table_name='tags')
+    op.drop_table('tags')
+    op.drop_index('ix_users_username', table_name='users')
+    op.drop_index('ix_users_email', table_name='users')
+    op.drop_index('ix_users_id', table_name='users')
+    op.drop_table('users')
@@ -0,0 +1,113 @@
+"""counters, feed inboxes, trending scores and full-text search
+
+Adds the denormalized likes, comments and tag counters, the feed_entries
+fan-out inbox, post_scores and the full-text index, and fills them from
+the existing rows.
+
+Revision ID: 9b4e7a18c2d5
+Revises: 5d1f0c2a7b31
+Create Date: 2026-10-17 00:01:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.search import ensure_search_index
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b4e7a18c2d5'
+down_revision: Union[str, None] = '5d1f0c2a7b31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SQLITE_SEARCH_DROP = [
+    "DROP TRIGGER IF EXISTS posts_fts_au",
+    "DROP TRIGGER IF EXISTS posts_fts_ad",
+    "DROP TRIGGER IF EXISTS posts_fts_ai",
+    "DROP TABLE IF EXISTS posts_fts",
+]
+
+POSTGRES_SEARCH_DROP = [
+    "DROP INDEX IF EXISTS ix_posts_search_vector",
+    "ALTER TABLE posts DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.add_column(sa.Column('is_high_fanout', sa.Boolean(), server_default=sa.false(), nullable=False))
+    with op.batch_alter_table('posts') as batch_op:
+        batch_op.add_column(sa.Column('likes_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('comments_count', sa.Integer(), server_default='0', nullable=False))
+    with op.batch_alter_table('tags') as batch_op:
+        batch_op.add_column(sa.Column('posts_count', sa.Integer(), server_default='0', nullable=False))
+
+    op.create_table(
+        'feed_entries',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['post_id'], ['posts.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'post_id')
+    )
+    op.create_index('ix_feed_entries_post_id', 'feed_entries', ['post_id'])
+    op.create_index('ix_feed_entries_user_created_post', 'feed_entries', ['user_id', 'created_at', 'post_id'])
+
+    op.create_table(
+        'post_scores',
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.Column('views_seen', sa.Integer(), nullable=False),
+        sa.Column('computed_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['post_id'], ['posts.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('post_id')
+    )
+    op.create_index('ix_post_scores_score', 'post_scores', ['score'])
+
+    bind = op.get_bind()
+    bind.exec_driver_sql(
+        "UPDATE posts SET "
+        "likes_count = (SELECT count(*) FROM post_reactions WHERE post_reactions.post_id = posts.id), "
+        "comments_count = (SELECT count(*) FROM comments WHERE comments.post_id = posts.id)"
+    )
+    bind.exec_driver_sql(
+        "UPDATE tags SET posts_count = ("
+        "SELECT count(*) FROM post_tags JOIN posts ON posts.id = post_tags.post_id "
+        "WHERE post_tags.tag_id = tags.id AND posts.is_published)"
+    )
+    bind.exec_driver_sql(
+        "INSERT INTO feed_entries (user_id, post_id, created_at) "
+        "SELECT user_subscriptions.follower_id, posts.id, posts.created_at "
+        "FROM user_subscriptions JOIN posts ON posts.user_id = user_subscriptions.following_id "
+        "WHERE posts.is_published AND posts.created_at IS NOT NULL"
+    )
+
+    ensure_search_index(bind)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "sqlite":
+        for statement in SQLITE_SEARCH_DROP:
+            bind.exec_driver_sql(statement)
+    elif bind.dialect.name == "postgresql":
+        for statement in POSTGRES_SEARCH_DROP:
+            bind.exec_driver_sql(statement)
+
+    op.drop_index('ix_post_scores_score', table_name='post_scores')
+    op.drop_table('post_scores')
+    op.drop_index('ix_feed_entries_user_created_post', table_name='feed_entries')
+    op.drop_index('ix_feed_entries_post_id', table_name='feed_entries')
+    op.drop_table('feed_entries')
+
+    with op.batch_alter_table('tags') as batch_op:
+        batch_op.drop_column('posts_count')
+    with op.batch_alter_table('posts') as batch_op:
+        batch_op.drop_column('comments_count')
+        batch_op.drop_column('likes_count')
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('is_high_fanout')
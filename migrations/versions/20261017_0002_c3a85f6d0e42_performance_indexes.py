@@ -0,0 +1,43 @@
+"""performance indexes for hot filters
+
+Covers keyset pagination of posts and users, follower lookups, per-post
+likes, comment threads and the trending and tag listings.
+
+Revision ID: c3a85f6d0e42
+Revises: 9b4e7a18c2d5
+Create Date: 2026-10-17 00:02:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3a85f6d0e42'
+down_revision: Union[str, None] = '9b4e7a18c2d5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# name, table, columns
+INDEXES = [
+    ('ix_posts_published_created_id', 'posts', ['is_published', 'created_at', 'id']),
+    ('ix_posts_user_created_id', 'posts', ['user_id', 'created_at', 'id']),
+    ('ix_users_active_id', 'users', ['is_active', 'id']),
+    ('ix_user_subscriptions_following_id', 'user_subscriptions', ['following_id']),
+    ('ix_post_reactions_post_id', 'post_reactions', ['post_id']),
+    ('ix_post_reactions_reacted_at', 'post_reactions', ['reacted_at']),
+    ('ix_comments_parent_comment_id', 'comments', ['parent_comment_id']),
+    ('ix_comments_created_at', 'comments', ['created_at']),
+    ('ix_tags_posts_count', 'tags', ['posts_count']),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,55 @@
+"""Recompute denormalized post and tag counters that drifted from their source tables"""
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.database import Post, Comment, Tag, post_reactions, post_tags
+from app.db_utils import engine
+
+
+def reconcile_counters(bind=engine) -> int:
+    """Fix likes_count and comments_count in one bulk UPDATE, return number of fixed posts"""
+    likes = select(func.count()).where(post_reactions.c.post_id == Post.id).scalar_subquery()
+    comments = select(func.count(Comment.id)).where(Comment.post_id == Post.id).scalar_subquery()
+
+    with Session(bind) as db:
+        result = db.execute(
+            update(Post).where(
+                or_(Post.likes_count != likes, Post.comments_count != comments)
+            ).values(
+                likes_count=likes,
+                comments_count=comments,
+                modified_at=Post.modified_at
+            ).execution_options(synchronize_session=False)
+        )
+        db.commit()
+
+    return result.rowcount
+
+
+def reconcile_tag_counts(bind=engine) -> int:
+    """Fix posts_count of tags in one bulk UPDATE, return number of fixed tags"""
+    published = select(func.count()).select_from(
+        post_tags.join(Post, Post.id == post_tags.c.post_id)
+    ).where(
+        post_tags.c.tag_id == Tag.id,
+        Post.is_published == True
+    ).scalar_subquery()
+
+    with Session(bind) as db:
+        result = db.execute(
+            update(Tag).where(Tag.posts_count != published).values(
+                posts_count=published
+            ).execution_options(synchronize_session=False)
+        )
+        db.commit()
+
+    return result.rowcount
+
+
+if __name__ == "__main__":
+    print("Reconciling post counters...")
+    fixed = reconcile_counters()
+    print(f"✓ Reconciled counters on {fixed} posts")
+    fixed = reconcile_tag_counts()
+    print(f"✓ Reconciled counters on {fixed} tags")
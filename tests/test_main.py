@@ -1,13 +1,45 @@
 """Basic tests for the blog platform"""
 
+import asyncio
+import json
+import logging
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import bcrypt
+import brotli
+
 import pytest
+from alembic import command as alembic_command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config as AlembicConfig
+from alembic.migration import MigrationContext
+from fastapi import FastAPI
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, func, inspect, select, update
+from sqlalchemy import exc as sqlalchemy_exc
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 from app.main import app
-from app.database import Base
-from app.db_utils import get_db
+from app.compression import CompressionMiddleware
+from app.config import settings
+from app.database import Base, Comment, include_in_migrations, Post, User, post_reactions, post_scores, user_subscriptions
+from app.db_utils import DatabaseRoute, check_async_settings, get_db, get_async_db
+from app.routers import posts as posts_router, users as users_router
+from app.pool_metrics import InstrumentedQueuePool, instrument_pool, pool_stats
+from app.view_counter import view_buffer, flush_views
+from app.cache import response_cache
+from app.tags import tag_id_cache, tag_snapshots
+from app.trending import recompute_scores
+from app.read_models import post_list_query
+from app.timing import configure_request_log, instrument_engine
+from app import auth as auth_module
+from app.auth import user_cache, password_needs_rehash
+from reconcile_counters import reconcile_counters, reconcile_tag_counts
 
 # Test database
 SQLALCHEMY_TEST_DATABASE_URL = "sqlite:///./test.db"
@@ -23,14 +55,35 @@ def override_get_db():
         db.close()
 
 
+instrument_engine(engine)
 app.dependency_overrides[get_db] = override_get_db
 client = TestClient(app)
 
 
+@contextmanager
+def count_queries():
+    """Collect SQL statements executed on the test engine"""
+    statements = []
+    
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
 @pytest.fixture(autouse=True)
 def setup_database():
     """Create tables before each test and drop after"""
     Base.metadata.create_all(bind=engine)
+    view_buffer.clear()
+    response_cache.clear()
+    user_cache.clear()
+    tag_id_cache.clear()
+    tag_snapshots.clear()
     yield
     Base.metadata.drop_all(bind=engine)
 
@@ -92,6 +145,76 @@ class TestAuth:
         assert "access_token" in data
         assert data["token_type"] == "bearer"
     
+    def test_current_user_is_cached(self):
+        """Test authenticated requests reuse the cached user until it changes"""
+        user_id = client.post(
+            "/api/v1/auth/register",
+            json={"email": "test@example.com", "username": "testuser", "password": "password123"}
+        ).json()["id"]
+        token = client.post(
+            "/api/v1/auth/login",
+            data={"username": "testuser", "password": "password123"}
+        ).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        
+        client.get("/api/v1/auth/me", headers=headers)
+        with count_queries() as statements:
+            assert client.get("/api/v1/auth/me", headers=headers).json()["username"] == "testuser"
+        assert statements == []
+        
+        client.put(f"/api/v1/users/{user_id}", json={"username": "renamed"}, headers=headers)
+        assert client.get("/api/v1/auth/me", headers=headers).json()["username"] == "renamed"
+        
+        client.delete(f"/api/v1/users/{user_id}", headers=headers)
+        assert client.get("/api/v1/auth/me", headers=headers).status_code == 401
+    
+    def test_login_rehashes_outdated_cost(self):
+        """Test login upgrades a hash made with an old bcrypt cost"""
+        db = TestingSessionLocal()
+        try:
+            old_hash = bcrypt.hashpw(b"password123", bcrypt.gensalt(rounds=4)).decode("utf-8")
+            db.add(User(email="old@example.com", username="olduser", password_hash=old_hash))
+            db.commit()
+            
+            response = client.post("/api/v1/auth/login", data={"username": "olduser", "password": "password123"})
+            assert response.status_code == 200
+            
+            db.expire_all()
+            new_hash = db.query(User).filter(User.username == "olduser").one().password_hash
+            assert new_hash != old_hash
+            assert not password_needs_rehash(new_hash)
+            assert bcrypt.checkpw(b"password123", new_hash.encode("utf-8"))
+        finally:
+            db.close()
+    
+    def test_register_rejected_when_hashing_saturated(self, monkeypatch):
+        """Test registration gets 503 when the password hashing queue is full"""
+        monkeypatch.setattr(auth_module, "_hash_slots", threading.BoundedSemaphore(1))
+        auth_module._hash_slots.acquire()
+        
+        response = client.post(
+            "/api/v1/auth/register",
+            json={"email": "test@example.com", "username": "testuser", "password": "password123"}
+        )
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+    
+    def test_login_rejected_when_hashing_saturated(self, monkeypatch):
+        """Test login gets 503 when the password hashing queue is full"""
+        client.post(
+            "/api/v1/auth/register",
+            json={"email": "test@example.com", "username": "testuser", "password": "password123"}
+        )
+        monkeypatch.setattr(auth_module, "_hash_slots", threading.BoundedSemaphore(1))
+        auth_module._hash_slots.acquire()
+        
+        response = client.post(
+            "/api/v1/auth/login",
+            data={"username": "testuser", "password": "password123"}
+        )
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+    
     def test_login_wrong_password(self):
         """Test login with wrong password"""
         client.post(
@@ -154,12 +277,574 @@ class TestPosts:
         assert data["post_title"] == "Test Post"
         assert data["post_content"] == "This is a test post content"
     
+    def test_post_tags_bulk(self, auth_headers):
+        """Test tags are resolved in bulk, de-duplicated and replaced on update"""
+        tag_names = [f"tag{i}" for i in range(10)]
+        response = client.post(
+            "/api/v1/posts",
+            json={"post_title": "Tagged", "post_content": "Content", "tag_names": tag_names + ["TAG0 "]},
+            headers=auth_headers
+        )
+        assert response.status_code == 201
+        assert sorted(t["tag_name"] for t in response.json()["tags"]) == sorted(tag_names)
+        
+        # Tags are cached once they are found existing, then no lookup is needed
+        with count_queries() as statements:
+            client.post(
+                "/api/v1/posts",
+                json={"post_title": "Tagged again", "post_content": "Content", "tag_names": tag_names},
+                headers=auth_headers
+            )
+        assert sum("tags.tag_name IN" in sql for sql in statements) == 1
+        with count_queries() as statements:
+            response = client.post(
+                "/api/v1/posts",
+                json={"post_title": "Tagged again", "post_content": "Content", "tag_names": tag_names},
+                headers=auth_headers
+            )
+        assert response.status_code == 201
+        assert not any("tags.tag_name IN" in sql for sql in statements)
+        assert sum(sql.startswith("INSERT INTO post_tags") for sql in statements) == 1
+        
+        post_id = response.json()["id"]
+        response = client.put(
+            f"/api/v1/posts/{post_id}",
+            json={"tag_names": ["tag1", "fresh"]},
+            headers=auth_headers
+        )
+        assert sorted(t["tag_name"] for t in response.json()["tags"]) == ["fresh", "tag1"]
+    
     def test_get_posts(self):
         """Test getting all posts"""
         response = client.get("/api/v1/posts")
         assert response.status_code == 200
         assert isinstance(response.json(), list)
     
+    def test_get_posts_counts(self, auth_headers):
+        """Test like and comment counts in post listing"""
+        post_id = client.post(
+            "/api/v1/posts",
+            json={"post_title": "Counted", "post_content": "Content", "tag_names": ["мода"]},
+            headers=auth_headers
+        ).json()["id"]
+        client.post(f"/api/v1/posts/{post_id}/like", headers=auth_headers)
+        client.post(f"/api/v1/posts/{post_id}/comments", json={"comment_text": "One"}, headers=auth_headers)
+        client.post(f"/api/v1/posts/{post_id}/comments", json={"comment_text": "Two"}, headers=auth_headers)
+        
+        response = client.get("/api/v1/posts")
+        assert response.status_code == 200
+        post = response.json()[0]
+        assert post["likes_count"] == 1
+        assert post["comments_count"] == 2
+        assert post["author"]["username"] == "testuser"
+        assert [t["tag_name"] for t in post["tags"]] == ["мода"]
+    
+    def test_post_list_projection(self, auth_headers):
+        """Test projected list rows match the full post response and can be cut to an excerpt"""
+        post_id = client.post(
+            "/api/v1/posts",
+            json={"post_title": "Projected", "post_content": "Длинный текст " * 50, "tag_names": ["мода"]},
+            headers=auth_headers
+        ).json()["id"]
+        
+        listed = client.get("/api/v1/posts").json()[0]
+        full = client.get(f"/api/v1/posts/{post_id}").json()
+        assert listed == {**full, "view_counter": 0}
+        
+        with count_queries() as statements:
+            short = client.get("/api/v1/posts?excerpt_length=20").json()[0]
+        assert short["post_content"] == full["post_content"][:20]
+        assert short["content_truncated"] is True
+        assert "substr(posts.post_content" in statements[0]
+        assert "posts.post_content AS" not in statements[0]
+        assert client.get("/api/v1/posts?excerpt_length=5000").status_code == 422
+        assert client.get("/api/v1/posts?excerpt_length=1000").json()[0]["content_truncated"] is False
+    
+    def test_get_posts_query_count(self, auth_headers):
+        """Test post listing runs a fixed number of queries regardless of page size"""
+        for i in range(5):
+            post_id = client.post(
+                "/api/v1/posts",
+                json={"post_title": f"Post {i}", "post_content": "Content", "tag_names": ["a", "b"]},
+                headers=auth_headers
+            ).json()["id"]
+            client.post(f"/api/v1/posts/{post_id}/like", headers=auth_headers)
+            client.post(f"/api/v1/posts/{post_id}/comments", json={"comment_text": "Hi"}, headers=auth_headers)
+        
+        with count_queries() as small_page:
+            assert len(client.get("/api/v1/posts?page_size=1").json()) == 1
+        with count_queries() as full_page:
+            assert len(client.get("/api/v1/posts?page_size=5").json()) == 5
+        
+        assert len(small_page) == len(full_page)
+        assert len(full_page) <= 2
+    
+    def test_counters_follow_writes(self, auth_headers):
+        """Test stored like and comment counters are updated by writes"""
+        created = client.post(
+            "/api/v1/posts",
+            json={"post_title": "Counters", "post_content": "Content"},
+            headers=auth_headers
+        ).json()
+        post_id = created["id"]
+        client.post(f"/api/v1/posts/{post_id}/like", headers=auth_headers)
+        client.post(f"/api/v1/posts/{post_id}/comments", json={"comment_text": "Hi"}, headers=auth_headers)
+        
+        data = client.get(f"/api/v1/posts/{post_id}").json()
+        assert data["likes_count"] == 1
+        assert data["comments_count"] == 1
+        
+        client.delete(f"/api/v1/posts/{post_id}/like", headers=auth_headers)
+        data = client.get(f"/api/v1/posts/{post_id}").json()
+        assert data["likes_count"] == 0
+        # Counter updates are not edits of the post
+        assert data["modified_at"] == created["modified_at"]
+    
+    def test_reconcile_counters(self, auth_headers):
+        """Test reconciliation fixes drifted counters"""
+        post_id = client.post(
+            "/api/v1/posts",
+            json={"post_title": "Drift", "post_content": "Content"},
+            headers=auth_headers
+        ).json()["id"]
+        client.post(f"/api/v1/posts/{post_id}/like", headers=auth_headers)
+        
+        with engine.begin() as conn:
+            conn.execute(update(Post).where(Post.id == post_id).values(likes_count=7, comments_count=3))
+        modified_at = client.get(f"/api/v1/posts/{post_id}").json()["modified_at"]
+        response_cache.clear()
+        
+        assert reconcile_counters(engine) == 1
+        data = client.get(f"/api/v1/posts/{post_id}").json()
+        assert data["likes_count"] == 1
+        assert data["modified_at"] == modified_at
+        assert data["comments_count"] == 0
+        assert reconcile_counters(engine) == 0
+    
+    def test_tag_counts(self, auth_headers):
+        """Test tag post counts follow create, retag, unpublish and delete, and the trending window"""
+        def create(tag_names, is_published=True):
+            return client.post(
+                "/api/v1/posts",
+                json={"post_title": "Tagged", "post_content": "Content", "tag_names": tag_names, "is_published": is_published},
+                headers=auth_headers
+            ).json()["id"]
+        
+        def counts(**params):
+            tag_snapshots.clear()
+            return {t["tag_name"]: t["posts_count"] for t in client.get("/api/v1/tags", params=params).json()}
+        
+        first = create(["style", "paris"])
+        second = create(["style"])
+        draft = create(["style", "draft"], is_published=False)
+        assert counts() == {"style": 2, "paris": 1}
+        
+        client.put(f"/api/v1/posts/{first}", json={"tag_names": ["paris", "milan"]}, headers=auth_headers)
+        client.put(f"/api/v1/posts/{draft}", json={"is_published": True}, headers=auth_headers)
+        client.put(f"/api/v1/posts/{second}", json={"is_published": False}, headers=auth_headers)
+        assert counts() == {"style": 1, "paris": 1, "milan": 1, "draft": 1}
+        
+        client.delete(f"/api/v1/posts/{draft}", headers=auth_headers)
+        assert counts() == {"paris": 1, "milan": 1}
+        assert reconcile_tag_counts(engine) == 0
+        
+        with engine.begin() as conn:
+            conn.execute(update(Post).where(Post.id == first).values(created_at=datetime.utcnow() - timedelta(days=30)))
+        create(["milan"])
+        tag_snapshots.clear()
+        trending = client.get("/api/v1/tags", params={"sort": "trending", "days": 7}).json()
+        assert [(t["tag_name"], t["recent_posts_count"]) for t in trending] == [("milan", 1)]
+    
+    def test_my_bookmarks(self, auth_headers):
+        """Test listing bookmarked posts, newest post first"""
+        post_id = client.post(
+            "/api/v1/posts",
+            json={"post_title": "Saved", "post_content": "Content"},
+            headers=auth_headers
+        ).json()["id"]
+        newer_id = client.post(
+            "/api/v1/posts",
+            json={"post_title": "Saved later", "post_content": "Content"},
+            headers=auth_headers
+        ).json()["id"]
+        client.post(f"/api/v1/posts/{newer_id}/bookmark", headers=auth_headers)
+        client.post(f"/api/v1/posts/{post_id}/bookmark", headers=auth_headers)
+        
+        response = client.get("/api/v1/users/me/bookmarks", headers=auth_headers)
+        assert response.status_code == 200
+        # Ordered by when the posts were written, not when they were bookmarked
+        assert [p["post_title"] for p in response.json()] == ["Saved later", "Saved"]
+    
+    def test_posts_batch(self, auth_headers):
+        """Test batch fetch keeps request order and sets viewer flags"""
+        ids = [
+            client.post(
+                "/api/v1/posts",
+                json={"post_title": f"Batch {i}", "post_content": "Content"},
+                headers=auth_headers
+            ).json()["id"]
+            for i in range(3)
+        ]
+        client.post(f"/api/v1/posts/{ids[0]}/like", headers=auth_headers)
+        client.post(f"/api/v1/posts/{ids[2]}/bookmark", headers=auth_headers)
+        request = {"post_ids": [ids[2], 999, ids[0], ids[1], ids[2]]}
+        
+        with count_queries() as statements:
+            response = client.post("/api/v1/posts/batch", json=request, headers=auth_headers)
+        assert response.status_code == 200
+        flags = [(p["id"], p["liked_by_me"], p["bookmarked_by_me"]) for p in response.json()]
+        assert flags == [(ids[2], False, True), (ids[0], True, False), (ids[1], False, False)]
+        # Posts, their tags, likes and bookmarks
+        assert len(statements) == 4
+        
+        anonymous = client.post("/api/v1/posts/batch", json=request).json()
+        assert not any(p["liked_by_me"] or p["bookmarked_by_me"] for p in anonymous)
+        assert client.post("/api/v1/posts/batch", json={"post_ids": list(range(101))}).status_code == 422
+    
+    def test_trending_posts(self, auth_headers):
+        """Test trending ranks by decayed activity and is recomputed incrementally"""
+        def create(title):
+            return client.post(
+                "/api/v1/posts",
+                json={"post_title": title, "post_content": "Content"},
+                headers=auth_headers
+            ).json()["id"]
+        
+        quiet = create("Quiet")
+        liked = create("Liked")
+        commented = create("Commented")
+        client.post(f"/api/v1/posts/{liked}/like", headers=auth_headers)
+        client.post(f"/api/v1/posts/{commented}/comments", json={"comment_text": "Hi"}, headers=auth_headers)
+        with engine.begin() as conn:
+            # An old view count on a new post, and an old like that has decayed
+            conn.execute(update(Post).where(Post.id == quiet).values(view_counter=5))
+            conn.execute(post_reactions.update().values(reacted_at=datetime.utcnow() - timedelta(days=30)))
+        
+        db = TestingSessionLocal()
+        try:
+            now = datetime.utcnow()
+            recompute_scores(db, now)
+            titles = [p["post_title"] for p in client.get("/api/v1/posts/trending").json()]
+            assert titles == ["Commented", "Quiet"]
+            
+            # The next run only adds the new like, then decays everything by a half-life
+            client.post(f"/api/v1/posts/{quiet}/like", headers=auth_headers)
+            recompute_scores(db, now + timedelta(seconds=30))
+            with engine.connect() as conn:
+                scores = dict(conn.execute(select(post_scores.c.post_id, post_scores.c.score)).all())
+            assert scores[quiet] == pytest.approx(0.5 + 3.0, rel=0.01)
+            recompute_scores(db, now + timedelta(hours=settings.TRENDING_HALF_LIFE_HOURS, seconds=30))
+            with engine.connect() as conn:
+                scores = dict(conn.execute(select(post_scores.c.post_id, post_scores.c.score)).all())
+            assert scores[commented] == pytest.approx(2.5, rel=0.01)
+        finally:
+            db.close()
+        
+        titles = [p["post_title"] for p in client.get("/api/v1/posts/trending").json()]
+        assert titles == ["Commented", "Quiet"]
+    
+    def test_views_are_buffered(self, auth_headers):
+        """Test post views are buffered and flushed in one batch"""
+        post_id = client.post(
+            "/api/v1/posts",
+            json={"post_title": "Viewed", "post_content": "Content"},
+            headers=auth_headers
+        ).json()["id"]
+        
+        client.get(f"/api/v1/posts/{post_id}")
+        assert client.get(f"/api/v1/posts/{post_id}").json()["view_counter"] == 2
+        assert client.get("/api/v1/posts").json()[0]["view_counter"] == 0
+        
+        db = TestingSessionLocal()
+        try:
+            modified_at = db.get(Post, post_id).modified_at
+            assert db.get(Post, post_id).view_counter == 0
+            with count_queries() as statements:
+                assert flush_views(db) == 1
+            assert len([s for s in statements if s.startswith("UPDATE")]) == 1
+            db.expire_all()
+            assert db.get(Post, post_id).view_counter == 2
+            assert db.get(Post, post_id).modified_at == modified_at
+        finally:
+            db.close()
+        
+        assert client.get(f"/api/v1/posts/{post_id}").json()["view_counter"] == 3
+        # A flush leaves cached listings alone, their counters catch up when the entry expires
+        hits = response_cache.stats()["hits"]
+        assert client.get("/api/v1/posts").json()[0]["view_counter"] == 0
+        assert response_cache.stats()["hits"] == hits + 1
+    
+    def test_get_posts_cursor(self, auth_headers):
+        """Test cursor pagination survives posts inserted mid-scroll"""
+        ids = [
+            client.post(
+                "/api/v1/posts",
+                json={"post_title": f"Post {i}", "post_content": "Content"},
+                headers=auth_headers
+            ).json()["id"]
+            for i in range(5)
+        ]
+        
+        first = client.get("/api/v1/posts?page_size=2")
+        seen = [p["id"] for p in first.json()]
+        cursor = first.headers["X-Next-Cursor"]
+        
+        client.post(
+            "/api/v1/posts",
+            json={"post_title": "Late post", "post_content": "Content"},
+            headers=auth_headers
+        )
+        
+        while cursor:
+            response = client.get(f"/api/v1/posts?page_size=2&cursor={cursor}")
+            seen += [p["id"] for p in response.json()]
+            cursor = response.headers.get("X-Next-Cursor")
+        
+        assert seen == list(reversed(ids))
+    
+    def test_get_posts_invalid_cursor(self):
+        """Test malformed cursor is rejected"""
+        response = client.get("/api/v1/posts?cursor=not-a-cursor")
+        assert response.status_code == 400
+    
+    def test_search_posts(self, auth_headers):
+        """Test full-text search is ranked and follows edits and deletes"""
+        client.post(
+            "/api/v1/posts",
+            json={"post_title": "Парижские каникулы", "post_content": "Неделя в Париже"},
+            headers=auth_headers
+        )
+        other_id = client.post(
+            "/api/v1/posts",
+            json={"post_title": "Мода", "post_content": "Тренды весны и немного о Париже"},
+            headers=auth_headers
+        ).json()["id"]
+        
+        results = client.get("/api/v1/posts?search=париж&highlight=true").json()
+        assert [p["post_title"] for p in results] == ["Парижские каникулы", "Мода"]
+        assert "<mark>" in results[0]["snippet"]
+        
+        # Snippets are safe HTML, markup from the post comes back escaped
+        client.post(
+            "/api/v1/posts",
+            json={"post_title": "Весна", "post_content": "<img src=x onerror=alert(1)> Милан весной"},
+            headers=auth_headers
+        )
+        snippet = client.get("/api/v1/posts?search=милан&highlight=true").json()[0]["snippet"]
+        assert "<img" not in snippet
+        assert "&lt;img src=x onerror=alert(1)&gt;" in snippet
+        assert "<mark>Милан</mark>" in snippet
+        
+        client.put(f"/api/v1/posts/{other_id}", json={"post_content": "Только тренды"}, headers=auth_headers)
+        assert len(client.get("/api/v1/posts?search=париж").json()) == 1
+        assert len(client.get("/api/v1/posts?search=тренды").json()) == 1
+        
+        client.delete(f"/api/v1/posts/{other_id}", headers=auth_headers)
+        assert client.get("/api/v1/posts?search=тренды").json() == []
+    
+    def test_conditional_get(self, auth_headers):
+        """Test ETag and Last-Modified validators answer repeat reads with 304"""
+        post_id = client.post(
+            "/api/v1/posts",
+            json={"post_title": "Conditional", "post_content": "Content"},
+            headers=auth_headers
+        ).json()["id"]
+        
+        for url in ["/api/v1/posts", f"/api/v1/posts/{post_id}", f"/api/v1/posts/{post_id}/comments", "/api/v1/users/1"]:
+            first = client.get(url)
+            assert first.headers["ETag"].startswith('W/"')
+            assert "stale-while-revalidate" in first.headers["Cache-Control"]
+            
+            with count_queries() as statements:
+                repeat = client.get(url, headers={"If-None-Match": first.headers["ETag"]})
+            assert repeat.status_code == 304
+            assert repeat.headers["ETag"] == first.headers["ETag"]
+            assert statements == []
+            
+            since = client.get(url, headers={"If-Modified-Since": first.headers["Last-Modified"]})
+            assert since.status_code == 304
+            assert client.get(url, headers={"If-None-Match": 'W/"stale"'}).status_code == 200
+        
+        # Deleting a listed post moves no row's modified_at, but the rebuilt list is newer
+        other_id = client.post(
+            "/api/v1/posts",
+            json={"post_title": "Short-lived", "post_content": "Content"},
+            headers=auth_headers
+        ).json()["id"]
+        listed = client.get("/api/v1/posts")
+        time.sleep(1)  # Last-Modified has one-second resolution
+        client.delete(f"/api/v1/posts/{other_id}", headers=auth_headers)
+        relisted = client.get("/api/v1/posts", headers={"If-Modified-Since": listed.headers["Last-Modified"]})
+        assert relisted.status_code == 200
+        assert [p["id"] for p in relisted.json()] == [post_id]
+        
+        etag = client.get(f"/api/v1/posts/{post_id}").headers["ETag"]
+        client.put(f"/api/v1/posts/{post_id}", json={"post_title": "Changed"}, headers=auth_headers)
+        changed = client.get(f"/api/v1/posts/{post_id}", headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.json()["post_title"] == "Changed"
+    
+    def test_compression(self, auth_headers):
+        """Test large responses are compressed per Accept-Encoding and small ones are not"""
+        client.post(
+            "/api/v1/posts",
+            json={"post_title": "Long read", "post_content": "Очень длинный текст. " * 200},
+            headers=auth_headers
+        )
+        
+        plain = client.get("/api/v1/posts", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in plain.headers
+        for encoding in ["gzip", "br"]:
+            response = client.get("/api/v1/posts", headers={"Accept-Encoding": encoding})
+            assert response.headers["content-encoding"] == encoding
+            assert "Accept-Encoding" in response.headers["vary"]
+            assert int(response.headers["content-length"]) < len(plain.content) / 4
+            assert response.json() == plain.json()
+        assert client.get("/health", headers={"Accept-Encoding": "gzip"}).headers.get("content-encoding") is None
+        assert client.get("/api/v1/posts", headers={"Accept-Encoding": "br;q=0, gzip"}).headers["content-encoding"] == "gzip"
+    
+    def test_compression_flushes_stream_chunks(self):
+        """Test every streamed chunk is decodable as soon as it arrives"""
+        lines = [json.dumps({"n": i}).encode() + b"\n" for i in range(3)]
+        
+        async def stream_app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/x-ndjson")]})
+            for i, line in enumerate(lines):
+                await send({"type": "http.response.body", "body": line, "more_body": i < len(lines) - 1})
+        
+        for encoding, decompressor in [("gzip", zlib.decompressobj(31)), ("br", brotli.Decompressor())]:
+            sent = []
+            
+            async def collect(message):
+                sent.append(message)
+            
+            scope = {"type": "http", "headers": [(b"accept-encoding", encoding.encode())]}
+            asyncio.run(CompressionMiddleware(stream_app)(scope, None, collect))
+            chunks = [m["body"] for m in sent if m["type"] == "http.response.body"]
+            decode = decompressor.decompress if encoding == "gzip" else decompressor.process
+            assert [decode(chunk) for chunk in chunks] == lines
+    
+    def test_response_cache(self, auth_headers):
+        """Test public reads are cached and invalidated by writes"""
+        post_id = client.post(
+            "/api/v1/posts",
+            json={"post_title": "Cached", "post_content": "Content"},
+            headers=auth_headers
+        ).json()["id"]
+        
+        client.get("/api/v1/posts")
+        with count_queries() as statements:
+            assert client.get("/api/v1/posts").json()[0]["likes_count"] == 0
+        assert statements == []
+        
+        client.post(f"/api/v1/posts/{post_id}/like", headers=auth_headers)
+        assert client.get("/api/v1/posts").json()[0]["likes_count"] == 1
+        
+        stats = client.get("/api/v1/metrics/cache").json()
+        assert stats["backend"] == "memory"
+        assert stats["hits"] == 1
+        assert stats["misses"] == 2
+    
+    def test_async_session_endpoints(self, auth_headers, monkeypatch):
+        """Test post and user endpoints served through an AsyncSession by DatabaseRoute"""
+        monkeypatch.setattr(settings, "DB_ASYNC", True)
+        async_engine = create_async_engine("sqlite+aiosqlite:///./test.db")
+        
+        async def override_get_async_db():
+            async with AsyncSession(async_engine) as db:
+                yield db
+        
+        async_app = FastAPI()
+        async_app.router.route_class = DatabaseRoute
+        for route in posts_router.router.routes + users_router.router.routes:
+            async_app.add_api_route(
+                route.path,
+                route.endpoint,
+                methods=route.methods,
+                response_model=route.response_model,
+                status_code=route.status_code
+            )
+        # Every posts and users endpoint takes a db session, so all of them are wrapped
+        assert all(hasattr(route.endpoint, "__wrapped__") for route in async_app.routes if isinstance(route, DatabaseRoute))
+        async_app.dependency_overrides[get_db] = override_get_db
+        async_app.dependency_overrides[get_async_db] = override_get_async_db
+        
+        with TestClient(async_app) as async_client:
+            created = async_client.post(
+                "/api/v1/posts",
+                json={"post_title": "Async", "post_content": "Content", "tag_names": ["a"]},
+                headers=auth_headers
+            )
+            assert created.status_code == 201
+            post_id = created.json()["id"]
+            assert created.json()["author"]["username"] == "testuser"
+            
+            listing = async_client.get("/api/v1/posts").json()
+            assert [p["id"] for p in listing] == [post_id]
+            assert listing[0]["tags"][0]["tag_name"] == "a"
+            assert async_client.get(f"/api/v1/posts/{post_id}").json()["author"]["username"] == "testuser"
+            assert async_client.get("/api/v1/posts/999").status_code == 404
+            
+            updated = async_client.put(
+                f"/api/v1/posts/{post_id}",
+                json={"post_title": "Async edited", "tag_names": ["b"]},
+                headers=auth_headers
+            )
+            assert updated.status_code == 200
+            assert [t["tag_name"] for t in updated.json()["tags"]] == ["b"]
+            
+            comment = async_client.post(
+                f"/api/v1/posts/{post_id}/comments",
+                json={"comment_text": "First"},
+                headers=auth_headers
+            )
+            assert comment.status_code == 201
+            assert comment.json()["user"]["username"] == "testuser"
+            reply = async_client.post(
+                f"/api/v1/posts/{post_id}/comments",
+                json={"comment_text": "Reply", "parent_comment_id": comment.json()["id"]},
+                headers=auth_headers
+            )
+            assert reply.status_code == 201
+            assert len(async_client.get(f"/api/v1/posts/{post_id}/comments").json()) == 2
+            tree = async_client.get(f"/api/v1/posts/{post_id}/comments/tree").json()
+            assert tree[0]["replies"][0]["comment_text"] == "Reply"
+            
+            assert async_client.post(f"/api/v1/posts/{post_id}/like", headers=auth_headers).status_code == 200
+            assert async_client.post(f"/api/v1/posts/{post_id}/bookmark", headers=auth_headers).status_code == 200
+            batch = async_client.post("/api/v1/posts/batch", json={"post_ids": [post_id]}, headers=auth_headers).json()
+            assert batch[0]["liked_by_me"] and batch[0]["bookmarked_by_me"]
+            assert async_client.get("/api/v1/posts/trending").status_code == 200
+            
+            user_id = created.json()["author"]["id"]
+            assert [p["id"] for p in async_client.get("/api/v1/users/me/bookmarks", headers=auth_headers).json()] == [post_id]
+            assert async_client.get("/api/v1/users/me/feed", headers=auth_headers).status_code == 200
+            assert async_client.get("/api/v1/users").json()[0]["posts_count"] == 1
+            assert async_client.get(f"/api/v1/users/{user_id}").json()["username"] == "testuser"
+            assert [p["id"] for p in async_client.get(f"/api/v1/users/{user_id}/posts").json()] == [post_id]
+            profile = async_client.put(
+                f"/api/v1/users/{user_id}",
+                json={"profile_text": "Async profile"},
+                headers=auth_headers
+            )
+            assert profile.status_code == 200
+            assert profile.json()["profile_text"] == "Async profile"
+            
+            assert async_client.delete(f"/api/v1/posts/{post_id}/like", headers=auth_headers).status_code == 200
+            assert async_client.delete(f"/api/v1/posts/{post_id}/bookmark", headers=auth_headers).status_code == 200
+            assert async_client.delete(f"/api/v1/posts/{post_id}", headers=auth_headers).status_code == 204
+            assert async_client.get(f"/api/v1/posts/{post_id}").status_code == 404
+    
+    def test_async_sessions_refuse_redis_backends(self, monkeypatch):
+        """Test DB_ASYNC does not start with a blocking Redis backend"""
+        monkeypatch.setattr(settings, "DB_ASYNC", True)
+        check_async_settings()
+        monkeypatch.setattr(settings, "VIEW_COUNTER_BACKEND", "redis")
+        with pytest.raises(RuntimeError, match="VIEW_COUNTER_BACKEND=redis"):
+            check_async_settings()
+        monkeypatch.setattr(settings, "DB_ASYNC", False)
+        check_async_settings()
+    
     def test_create_post_unauthorized(self):
         """Test creating post without authentication"""
         response = client.post(
@@ -254,6 +939,101 @@ class TestUsers:
         assert any(user["username"] == "searchuser" for user in users)
 
 
+    def test_get_users_stats_query_count(self):
+        """Test user stats are computed in a fixed number of queries regardless of page size"""
+        headers = []
+        for i in range(3):
+            client.post(
+                "/api/v1/auth/register",
+                json={"email": f"user{i}@example.com", "username": f"user{i}", "password": "password123"}
+            )
+            token = client.post(
+                "/api/v1/auth/login",
+                data={"username": f"user{i}", "password": "password123"}
+            ).json()["access_token"]
+            headers.append({"Authorization": f"Bearer {token}"})
+        users = client.get("/api/v1/users").json()
+        client.post(f"/api/v1/users/{users[0]['id']}/follow", headers=headers[1])
+        client.post(f"/api/v1/users/{users[0]['id']}/follow", headers=headers[2])
+        client.post("/api/v1/posts", json={"post_title": "Hi", "post_content": "Content"}, headers=headers[1])
+        
+        with count_queries() as small_page:
+            client.get("/api/v1/users?page_size=1")
+        with count_queries() as full_page:
+            users = client.get("/api/v1/users?page_size=3").json()
+        
+        assert len(small_page) == len(full_page) == 1
+        assert [(u["posts_count"], u["followers_count"], u["following_count"]) for u in users] == [
+            (0, 2, 0), (1, 0, 1), (0, 0, 1)
+        ]
+        assert client.get(f"/api/v1/users/{users[0]['id']}").json()["followers_count"] == 2
+    
+    def test_get_users_cursor(self):
+        """Test cursor pagination over users"""
+        for i in range(3):
+            client.post(
+                "/api/v1/auth/register",
+                json={"email": f"user{i}@example.com", "username": f"user{i}", "password": "password123"}
+            )
+        
+        first = client.get("/api/v1/users?page_size=2")
+        assert [u["username"] for u in first.json()] == ["user0", "user1"]
+        
+        second = client.get(f"/api/v1/users?page_size=2&cursor={first.headers['X-Next-Cursor']}")
+        assert [u["username"] for u in second.json()] == ["user2"]
+        assert "X-Next-Cursor" not in second.headers
+
+
+class TestFeed:
+    """Test home feed"""
+    
+    def register(self, name):
+        client.post(
+            "/api/v1/auth/register",
+            json={"email": f"{name}@example.com", "username": name, "password": "password123"}
+        )
+        token = client.post(
+            "/api/v1/auth/login",
+            data={"username": name, "password": "password123"}
+        ).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        return client.get("/api/v1/auth/me", headers=headers).json()["id"], headers
+    
+    def post(self, headers, title):
+        return client.post(
+            "/api/v1/posts",
+            json={"post_title": title, "post_content": "Content"},
+            headers=headers
+        ).json()["id"]
+    
+    def test_feed_merges_inbox_and_high_fanout_authors(self, monkeypatch):
+        """Test feed combines fanned-out posts with posts of high-fanout authors"""
+        monkeypatch.setattr(settings, "FEED_FANOUT_LIMIT", 1)
+        reader_id, reader = self.register("reader")
+        regular_id, regular = self.register("regular")
+        star_id, star = self.register("star")
+        _, fan = self.register("fan")
+        
+        early = self.post(regular, "Before follow")
+        client.post(f"/api/v1/users/{regular_id}/follow", headers=reader)
+        client.post(f"/api/v1/users/{star_id}/follow", headers=reader)
+        client.post(f"/api/v1/users/{star_id}/follow", headers=fan)
+        
+        first = self.post(regular, "Regular 1")
+        second = self.post(star, "Star 1")
+        third = self.post(regular, "Regular 2")
+        self.post(fan, "Not followed")
+        
+        page = client.get("/api/v1/users/me/feed?page_size=3", headers=reader)
+        assert [p["id"] for p in page.json()] == [third, second, first]
+        
+        rest = client.get(f"/api/v1/users/me/feed?page_size=3&cursor={page.headers['X-Next-Cursor']}", headers=reader)
+        assert [p["id"] for p in rest.json()] == [early]
+        
+        client.delete(f"/api/v1/users/{regular_id}/follow", headers=reader)
+        assert [p["id"] for p in client.get("/api/v1/users/me/feed", headers=reader).json()] == [second]
+
+
 class TestComments:
     """Test comment functionality"""
     
@@ -305,6 +1085,50 @@ class TestComments:
         data = response.json()
         assert data["comment_text"] == "Great post!"
     
+    def test_comment_tree(self, setup_post):
+        """Test nested comment threads with depth and reply limits"""
+        url = f"/api/v1/posts/{setup_post['post_id']}/comments"
+        headers = setup_post["headers"]
+        
+        def comment(text, parent=None):
+            return client.post(
+                url,
+                json={"comment_text": text, "parent_comment_id": parent},
+                headers=headers
+            ).json()["id"]
+        
+        first = comment("First")
+        reply = comment("Reply", first)
+        comment("Nested", reply)
+        comment("Second reply", first)
+        comment("Third reply", first)
+        comment("Newest")
+        
+        with count_queries() as statements:
+            tree = client.get(f"{url}/tree?max_depth=2&replies_limit=2").json()
+        
+        assert [c["comment_text"] for c in tree] == ["Newest", "First"]
+        first_thread = tree[1]
+        assert first_thread["replies_count"] == 3
+        assert [c["comment_text"] for c in first_thread["replies"]] == ["Reply", "Second reply"]
+        assert first_thread["replies"][0]["replies_count"] == 1
+        assert first_thread["replies"][0]["replies"] == []
+        assert first_thread["replies"][0]["user"]["username"] == "testuser"
+        assert len(statements) == 2
+        # Sibling positions are only computed under the page's threads
+        assert "thread_parents" in statements[-1]
+        
+        deeper = client.get(f"{url}/tree?max_depth=3&page_size=1&page=2").json()
+        assert deeper[0]["replies"][0]["replies"][0]["comment_text"] == "Nested"
+        
+        # Replies cut off by replies_limit are paged with parent_id
+        more = client.get(f"{url}/tree?parent_id={first}&page_size=2&page=2").json()
+        assert [c["comment_text"] for c in more] == ["Third reply"]
+        replies = client.get(f"{url}/tree?parent_id={first}&page_size=2&max_depth=2").json()
+        assert [c["comment_text"] for c in replies] == ["Reply", "Second reply"]
+        assert replies[0]["replies"][0]["comment_text"] == "Nested"
+        assert client.get(f"{url}/tree?parent_id=999").status_code == 404
+    
     def test_get_comments(self, setup_post):
         """Test getting post comments"""
         # Create comment
@@ -320,6 +1144,152 @@ class TestComments:
         comments = response.json()
         assert len(comments) > 0
         assert comments[0]["comment_text"] == "Test comment"
+    
+    def test_comments_cursor_and_stream(self, setup_post):
+        """Test cursor pagination in both orders and NDJSON streaming of comments"""
+        url = f"/api/v1/posts/{setup_post['post_id']}/comments"
+        for i in range(5):
+            client.post(url, json={"comment_text": f"Comment {i}"}, headers=setup_post["headers"])
+        
+        first = client.get(f"{url}?page_size=2")
+        assert [c["comment_text"] for c in first.json()] == ["Comment 4", "Comment 3"]
+        second = client.get(f"{url}?page_size=2&cursor={first.headers['X-Next-Cursor']}")
+        assert [c["comment_text"] for c in second.json()] == ["Comment 2", "Comment 1"]
+        
+        oldest = client.get(f"{url}?order=oldest&page_size=3")
+        assert [c["comment_text"] for c in oldest.json()] == ["Comment 0", "Comment 1", "Comment 2"]
+        rest = client.get(f"{url}?order=oldest&page_size=3&cursor={oldest.headers['X-Next-Cursor']}")
+        assert [c["comment_text"] for c in rest.json()] == ["Comment 3", "Comment 4"]
+        assert "X-Next-Cursor" not in rest.headers
+        
+        streamed = client.get(f"{url}?stream=true&order=oldest")
+        assert streamed.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in streamed.text.splitlines()]
+        assert [c["comment_text"] for c in lines] == [f"Comment {i}" for i in range(5)]
+        assert lines[0]["user"]["username"] == "testuser"
+
+
+def test_pool_metrics():
+    """Test pool instrumentation counts checkouts and timeouts"""
+    pool_engine = create_engine(
+        SQLALCHEMY_TEST_DATABASE_URL,
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05
+    )
+    instrument_pool(pool_engine)
+    
+    with pool_engine.connect():
+        with pytest.raises(sqlalchemy_exc.TimeoutError):
+            pool_engine.connect()
+        stats = pool_stats(pool_engine)
+        assert stats["checked_out"] == 1
+    
+    assert stats["checkouts"] == 2
+    assert stats["timeouts"] == 1
+    assert stats["wait_ms_max"] >= 50
+    assert stats["wait_ms_histogram"]["le_inf"] == 2
+    pool_engine.dispose()
+    
+    response = client.get("/api/v1/metrics/db-pool")
+    assert response.status_code == 200
+    assert "checked_out" in response.json()["sync"]
+
+
+def test_migrations_match_models(tmp_path):
+    """Test the migration chain builds the schema the models describe, and unwinds"""
+    migrated = create_engine(f"sqlite:///{tmp_path / 'migrated.db'}")
+    config = AlembicConfig("alembic.ini")
+    config.attributes["configure_logger"] = False
+
+    with migrated.begin() as conn:
+        config.attributes["connection"] = conn
+        alembic_command.upgrade(config, "head")
+        migration_context = MigrationContext.configure(conn, opts={"include_object": include_in_migrations})
+        assert compare_metadata(migration_context, Base.metadata) == []
+
+        alembic_command.downgrade(config, "base")
+        assert set(inspect(conn).get_table_names()) == {"alembic_version"}
+    migrated.dispose()
+
+
+def query_plan(statement) -> str:
+    """EXPLAIN QUERY PLAN details of a statement on the test database"""
+    sql = str(statement.compile(engine, compile_kwargs={"literal_binds": True}))
+    with engine.connect() as conn:
+        return "\n".join(row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}"))
+
+
+def test_hot_queries_use_indexes():
+    """Test hot list and lookup queries are served by an index, not a table scan"""
+    db = TestingSessionLocal()
+    cases = {
+        "ix_posts_published_created_id": post_list_query(db).filter(
+            Post.is_published == True
+        ).order_by(Post.created_at.desc(), Post.id.desc()).limit(20).statement,
+        "ix_posts_user_created_id": post_list_query(db).filter(
+            Post.user_id == 1
+        ).order_by(Post.created_at.desc(), Post.id.desc()).limit(20).statement,
+        "ix_post_reactions_post_id": select(func.count()).select_from(post_reactions).where(
+            post_reactions.c.post_id == 1
+        ),
+        "ix_user_subscriptions_following_id": select(user_subscriptions.c.follower_id).where(
+            user_subscriptions.c.following_id == 1
+        ),
+        "ix_comments_parent_comment_id": select(Comment.id).where(Comment.parent_comment_id == 1),
+    }
+    db.close()
+
+    for index, statement in cases.items():
+        plan = query_plan(statement)
+        assert index in plan, plan
+        assert "USE TEMP B-TREE FOR ORDER BY" not in plan, plan
+
+
+def test_server_timing(monkeypatch, caplog):
+    """Test requests report DB, JWT, bcrypt and rendering time in Server-Timing and the request log"""
+    user = {"email": "test@example.com", "username": "testuser", "password": "password123"}
+    client.post("/api/v1/auth/register", json=user)
+    assert "Server-Timing" not in client.get("/api/v1/posts").headers
+    
+    monkeypatch.setattr(settings, "SERVER_TIMING", True)
+    login = client.post("/api/v1/auth/login", data={"username": "testuser", "password": "password123"})
+    assert "bcrypt;dur=" in login.headers["Server-Timing"]
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    
+    with caplog.at_level("INFO", logger="app.requests"):
+        response = client.get("/api/v1/users/me/feed", headers=headers)
+    timing = response.headers["Server-Timing"]
+    for metric in ("db;dur=", "jwt;dur=", "serialize;dur=", "total;dur="):
+        assert metric in timing
+    assert "bcrypt" not in timing
+    
+    record = caplog.records[-1]
+    assert (record.method, record.path, record.status) == ("GET", "/api/v1/users/me/feed", 200)
+    assert record.db_queries >= 1
+    assert record.db_ms > 0 and record.jwt_ms > 0
+    assert record.duration_ms >= record.db_ms
+
+
+def test_request_log_handler(monkeypatch):
+    """Test the request log gets a level and a handler only when nothing else prints it"""
+    request_logger = logging.getLogger("app.requests")
+    monkeypatch.setattr(request_logger, "handlers", [])
+    monkeypatch.setattr(request_logger, "level", request_logger.level)
+    monkeypatch.setattr(logging.getLogger(), "handlers", [])
+    
+    configure_request_log("info")
+    assert request_logger.level == logging.INFO
+    assert len(request_logger.handlers) == 1
+    configure_request_log("warning")
+    assert request_logger.level == logging.WARNING
+    assert len(request_logger.handlers) == 1
+    
+    request_logger.handlers = []
+    logging.getLogger().handlers = [logging.NullHandler()]
+    configure_request_log("info")
+    assert request_logger.handlers == []
 
 
 def test_health_check():